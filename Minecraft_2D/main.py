@@ -1,8 +1,20 @@
 import pygame
+import math
 import os
 import random
-import math
-from noise import pnoise1
+import mmap
+import struct
+import io
+import tempfile
+import threading
+import time
+import argparse
+import asyncio
+import csv
+import json
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 # 初始化Pygame
@@ -14,18 +26,63 @@ WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
 TILE_SIZE = 32
 
-# 创建游戏窗口
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Minecraft 2D - 1.01")
+# 世界设置：横向无限延伸，按区块按需生成
+WORLD_HEIGHT = 100
+CHUNK_SIZE = 16  # 每个区块的宽度（列数）
+CHUNK_LOAD_MARGIN = 1  # 视野左右额外预加载的区块数
+CHUNK_EVICT_MARGIN = 3  # 离开视野超过这么多区块就卸载
+TREE_MAX_LEAF_RADIUS = 4  # 树冠最大半径
+REGION_SIZE = 32  # 每个区域文件保存的连续区块数
+SECTION_HEIGHT = 16  # 渲染缓存把区块纵向切成这么高的小段，每段一张离屏图
+AUTOSAVE_INTERVAL = 30.0  # 自动存档间隔（秒），崩溃时最多丢失这么久的改动
+TICK_RATE = 60  # 每秒模拟步数，重力、速度等常量都按一步给出
+TICK_TIME = 1.0 / TICK_RATE
+MAX_FRAME_TIME = 0.25  # 一帧最多补这么多秒的模拟，卡顿太久时宁可变慢也不无限追赶
+FPS = 60  # 渲染帧率上限
+HEADLESS_TICKS = 100000  # 无头模式默认运行的步数
+WANDER_PERIOD = 900  # 无头模式自动输入每走这么多步掉头
+WANDER_JUMP_INTERVAL = 120  # 无头模式自动输入每隔这么多步跳一次
+PROFILE_PHASES = ("events", "player", "chunks", "items", "tiles", "blocks", "light", "autosave", "world", "hotbar", "sprites", "overlay", "flip", "idle")
+PROFILE_COUNTS = ("ticks", "entities", "chunks", "blits")
+PROFILE_HISTORY = 120  # 调试信息里滚动平均和最坏值统计的帧数
+PROFILE_OVERLAY_INTERVAL = 15  # 调试信息每隔这么多帧重新排版一次
+MAX_LIGHT = 15  # 光照等级上限：直射阳光和最亮的光源
+SOLID_LIGHT_OPACITY = 4  # 实心方块默认每格吃掉的光照，阳光能透进地表下几格
+BLOCK_LOOKUP_MAX_CHUNKS = 32  # 批量查方块时，跨度不超过这么多区块就拼成一张表来查
+TNT_RADIUS = 4  # 爆炸半径（格）
+TNT_POWER = 1500  # 爆炸中心能炸开的最大硬度，向外线性减弱
+TNT_FUSE_TICKS = 180  # 点燃后到爆炸的模拟步数
+TNT_CHAIN_FUSE_TICKS = 10  # 被炸到的 TNT 的引信，再加上离爆炸中心的格数
+FURNACE_SMELT_TICKS = 200  # 熔炉烧好一个物品需要的模拟步数
+CHEST_SLOTS = 27  # 箱子最多能放的物品种类数
+SPAWN_PREGENERATE_CHUNKS = 64  # 出生点左右各预生成的区块数
+# 每个工作进程至少分到这么多区块才值得开进程池。实测生成一个区块约 35 µs，
+# 而开进程池约 4 ms、每多一个进程再加约 6 ms（还有结果传回来的开销）：两个进程要各分到约 400 个区块才回本。
+# 出生点预生成的 128 个区块因此总在本进程里生成；benchmark.py --only pregenerate 可以看单进程和进程池的交叉点
+PREGENERATE_CHUNKS_PER_WORKER = 512
+NET_PORT = 25565  # 多人模式的默认端口
+NET_MAX_MESSAGE = 1 << 20  # 单条消息的长度上限，超过就当作坏连接断开
+NET_MAX_BUFFER = 1 << 22  # 发给一个客户端、还没发出去的字节超过这么多就断开它（跟不上的客户端）
+NET_INPUT_BACKLOG = 8  # 服务器最多替每个客户端攒这么多步的输入，再多就丢掉最旧的
+NET_REACH = 8  # 多人模式里玩家能挖和放置的范围（格，以玩家中心所在格算，横竖各自不超过）
+NET_MAX_PLACE = 4  # 多人模式里一步最多放置的方块数，多出来的丢掉
+NET_STATS_WINDOW = 3600  # 服务器统计每步耗时用的最近步数
+BOT_TICKS = 600  # 模拟客户端默认运行的步数
+BOT_PLACE_INTERVAL = 40  # 模拟客户端每隔这么多步在身后放一个方块
 
 # 颜色定义
 SKY_COLOR = (135, 206, 235)
 CURSOR_COLOR = (255, 255, 255)  # 白色光标
+PLAYER_COLOR = (255, 0, 0)
+OTHER_PLAYER_COLOR = (0, 0, 255)  # 多人模式里的其他玩家
 CURSOR_WIDTH = 2  # 光标线条宽度
 
+# 贴图目录按本文件的位置找，不依赖当前工作目录
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
 # GUI设置
 GUI_SCALE = 0.7  # 保持物品栏背景的小尺寸
-HOTBAR_IMAGE = pygame.image.load('assets/gui_invrow.png')
+HOTBAR_IMAGE = pygame.image.load(os.path.join(ASSETS_DIR, "gui_invrow.png"))
 HOTBAR_IMAGE = pygame.transform.scale(HOTBAR_IMAGE, 
                                     (int(HOTBAR_IMAGE.get_width() * GUI_SCALE), 
                                      int(HOTBAR_IMAGE.get_height() * GUI_SCALE)))
@@ -33,50 +90,333 @@ SLOT_SIZE = int(16 * GUI_SCALE)  # 物品栏格子大小
 HOTBAR_PADDING = max(1, int(3 * GUI_SCALE))  # 内边距
 HOTBAR_Y_OFFSET = 5  # 添加这个定义
 
+SPRITE_CACHE_SIZE = 256  # 缩放贴图缓存最多保留的条目数
+
+# 掉落物设置
+ITEM_SIZE = TILE_SIZE // 2  # 掉落物大小是方块的一半
+ITEM_GRAVITY = 0.4
+ITEM_FRICTION = 0.8
+ITEM_BOBBING_SPEED = 0.1
+ITEM_SLEEP_SPEED = 0.05  # 落地后水平速度低于此值就进入休眠
+ITEM_CELL_SIZE = TILE_SIZE  # 同一格内的同类掉落物会合并成一堆
+
 # 物品显示大小和位置调整
 ITEM_SCALE = 3.0  # 物品相对于格子的大小比例
 ITEM_PADDING = 4  # 水平位置
 ITEM_VERTICAL_OFFSET = 4  # 垂直偏移
 
-# 方块类型
-BLOCK_TYPES = ["dirt", "grass", "rock", "wood", "leaves", "sand", "bedrock", "cobblestone"]
-
-# 定义方块属性
-BLOCK_PROPERTIES = {
-    "dirt": {"solid": True, "hardness": 10},
-    "grass": {"solid": True, "hardness": 10},
-    "rock": {"solid": True, "hardness": 500},      # 原石较硬
-    "cobblestone": {"solid": True, "hardness": 150},  # 石头
-    "wood": {"solid": False, "hardness": 25},
-    "leaves": {"solid": False, "hardness": 5},
-    "sand": {"solid": True, "hardness": 10},
-    "bedrock": {"solid": True, "hardness": float('inf')}  # 基岩无法破坏
-}
+# 方块注册表：方块和它们的属性都写在 blocks.json 里，按文件中的顺序分配整数ID（从 1 开始）。
+# hardness 为 null 表示无法挖掘，drop 为 null 表示不掉落，texture 是 assets 里的贴图名
+BLOCKS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blocks.json")
 
-# 修改掉落物对应关系
-BLOCK_DROPS = {
-    "dirt": "dirt",
-    "grass": "dirt",
-    "rock": "cobblestone",    # 原石破坏后掉落石头
-    "cobblestone": "cobblestone",
-    "wood": "wood",
-    "leaves": None,
-    "sand": "sand",
-    "bedrock": None
-}
+def load_block_registry(path=BLOCKS_FILE):
+    with open(path, encoding="utf-8") as f:
+        registry = json.load(f)
+    for block in registry["blocks"]:
+        if block["hardness"] is None:
+            block["hardness"] = float('inf')
+    return registry
 
-# 添加挖掘速度常量
-MINING_SPEED = {
-    "hand": 0.5,  # 空手挖掘速度改为0.5
-}
+BLOCK_REGISTRY = load_block_registry()
+
+# 按名称访问的属性表，只在非热路径中使用
+BLOCK_TYPES = [block["name"] for block in BLOCK_REGISTRY["blocks"]]
+BLOCK_PROPERTIES = {block["name"]: block for block in BLOCK_REGISTRY["blocks"]}
+BLOCK_DROPS = {block["name"]: block["drop"] for block in BLOCK_REGISTRY["blocks"]}
+BLOCK_TEXTURES = {block["name"]: block["texture"] for block in BLOCK_REGISTRY["blocks"]}
+MINING_SPEED = BLOCK_REGISTRY["mining_speed"]
+SMELTING_RECIPES = BLOCK_REGISTRY["smelting"]  # 熔炉：原料 -> 产物
+FURNACE_FUEL = BLOCK_REGISTRY["fuel"]  # 燃料 -> 能烧的模拟步数
+FLUIDS = BLOCK_REGISTRY["fluids"]  # 流体种类 -> 最远流动等级、每隔多少模拟步流动一次
+FLUID_TYPES = list(FLUIDS)  # 流体种类编号从 1 开始，0 表示不是流体
+
+# 方块ID表：世界网格中只存整数ID，0 表示空气
+AIR = 0
+BLOCK_NAMES = [None] + BLOCK_TYPES  # ID -> 名称
+BLOCK_IDS = {name: block_id for block_id, name in enumerate(BLOCK_NAMES) if name is not None}  # 名称 -> ID
+BLOCK_ID_DTYPE = np.uint8  # 每格一个字节
+
+# 按ID索引的属性查找表，热路径中直接用数组下标代替字典查找
+SOLID_LOOKUP = np.array([False] + [BLOCK_PROPERTIES[name]["solid"] for name in BLOCK_TYPES], dtype=bool)
+SOLID_TABLE = SOLID_LOOKUP.tolist()  # 同一张表的列表版：一格一格查时，列表下标比 NumPy 标量下标快得多
+HARDNESS_LOOKUP = np.array([0.0] + [BLOCK_PROPERTIES[name]["hardness"] for name in BLOCK_TYPES], dtype=np.float64)
+LIQUID_LOOKUP = np.array([False] + [BLOCK_PROPERTIES[name].get("liquid", False) for name in BLOCK_TYPES], dtype=bool)
+DROP_LOOKUP = np.array([AIR] + [BLOCK_IDS[BLOCK_DROPS[name]] if BLOCK_DROPS[name] else AIR for name in BLOCK_TYPES],
+                       dtype=BLOCK_ID_DTYPE)  # 破坏后掉落的方块ID，AIR 表示不掉落
+TEXTURE_NAMES = sorted(set(BLOCK_TEXTURES.values()))
+TEXTURE_LOOKUP = np.array([-1] + [TEXTURE_NAMES.index(BLOCK_TEXTURES[name]) for name in BLOCK_TYPES],
+                          dtype=np.int16)  # 方块ID -> TEXTURE_NAMES 中的下标
+# 掉落物落在任何非空气、非液体的方块上（包括树叶、木头）
+ITEM_COLLISION_LOOKUP = (np.arange(len(BLOCK_NAMES)) != AIR) & ~LIQUID_LOOKUP
+# 受重力影响、下面空了就会掉下去的方块（沙子、沙砾）
+FALLING_LOOKUP = np.array([False] + [BLOCK_PROPERTIES[name].get("falling", False) for name in BLOCK_TYPES], dtype=bool)
+# 流体：每格的流体种类编号和流动等级（0 是源头，越大离源头越远），以及 (种类, 等级) -> 方块ID
+FLUID_KIND_LOOKUP = np.array([0] + [FLUID_TYPES.index(BLOCK_PROPERTIES[name]["fluid"]) + 1
+                                    if "fluid" in BLOCK_PROPERTIES[name] else 0 for name in BLOCK_TYPES], dtype=np.uint8)
+FLUID_LEVEL_LOOKUP = np.array([0] + [BLOCK_PROPERTIES[name].get("level", 0) for name in BLOCK_TYPES], dtype=np.int16)
+FLUID_BLOCK_IDS = np.zeros((len(FLUID_TYPES) + 1, max(fluid["max_level"] for fluid in FLUIDS.values()) + 1),
+                           dtype=BLOCK_ID_DTYPE)
+FLUID_BLOCK_IDS[FLUID_KIND_LOOKUP[FLUID_KIND_LOOKUP > 0],
+                FLUID_LEVEL_LOOKUP[FLUID_KIND_LOOKUP > 0]] = np.flatnonzero(FLUID_KIND_LOOKUP)
+WATER = FLUID_TYPES.index("water") + 1
+LAVA = FLUID_TYPES.index("lava") + 1
+# 光照：每个方块自身发出的光、光穿过它时每格衰减多少（至少 1）
+LIGHT_EMISSION_LOOKUP = np.array([0] + [BLOCK_PROPERTIES[name].get("light", 0) for name in BLOCK_TYPES], dtype=np.int16)
+LIGHT_OPACITY_LOOKUP = np.array([0] + [BLOCK_PROPERTIES[name].get("opacity", SOLID_LIGHT_OPACITY if SOLID_LOOKUP[i + 1] else 0)
+                                       for i, name in enumerate(BLOCK_TYPES)], dtype=np.int16)
+LIGHT_DECAY_LOOKUP = np.maximum(LIGHT_OPACITY_LOOKUP, 1)
+# 带状态的方块（箱子、熔炉）对应的方块实体种类，None 表示普通方块；亮着和熄灭的熔炉是同一种
+TILE_ENTITY_KINDS = [None] + [BLOCK_PROPERTIES[name].get("tile_entity") for name in BLOCK_TYPES]
+TILE_ENTITY_LOOKUP = np.array([kind is not None for kind in TILE_ENTITY_KINDS], dtype=bool)
+
+# 按离地表的深度 + 1（-1 到 6 截断）查地层：空气、草地、5 层泥土、原石
+STRATA_LOOKUP = np.array([AIR, BLOCK_IDS["grass"]] + [BLOCK_IDS["dirt"]] * 5 + [BLOCK_IDS["rock"]], dtype=BLOCK_ID_DTYPE)
+AIR_LOOKUP = np.arange(len(BLOCK_NAMES)) == AIR
+
+# 地形生成参数
+TERRAIN_OCTAVES = 6
+TERRAIN_PERSISTENCE = 0.5
+TERRAIN_LACUNARITY = 2.0
+TERRAIN_SCALE = 50.0
+
+# 洞穴：两层二维梯度噪声叠加，值接近 0 的细带挖成蜿蜒的隧道，值很大的地方挖成大洞
+CAVE_SCALES = (32, 12)  # 每层噪声一个晶格跨多少格
+CAVE_WEIGHTS = (1.0, 0.4)  # 第一层权重固定为 1
+CAVE_TUNNEL_WIDTH = 0.07  # |噪声| 小于它的格子是隧道
+CAVE_CAVERN_LEVEL = 0.5  # 噪声大于它的格子是大洞
+CAVE_MIN_DEPTH = 4  # 地表以下这么多格以内不挖，地面不会被掏空
+CAVE_LAVA_DEPTH = 6  # 离世界底部这么多格以内挖出的洞填上岩浆
+
+# 矿脉：(方块, 替换的方块, 离地表的最小深度, 每列出现的概率)，越稀有的矿越深
+ORE_VEINS = (
+    ("coal_ore", "rock", 6, 0.06),
+    ("iron_ore", "rock", 12, 0.04),
+    ("gold_ore", "rock", 24, 0.015),
+    ("diamond_ore", "rock", 30, 0.008),
+    ("gravel", "rock", 8, 0.03),
+    ("clay", "dirt", 1, 0.03),
+)
+
+# 地下的小地牢：一间石砖房子
+DUNGEON_CHANCE = 0.004
+DUNGEON_MIN_DEPTH = 12
+BIRCH_CHANCE = 0.3  # 生成的树里白桦树的比例
+
+# 柏林噪声置换表（与 noise 库相同的 Ken Perlin 原始表，重复一遍免去取模）
+PERLIN_PERM = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140, 36, 103, 30,
+    69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120, 234, 75, 0, 26, 197, 62,
+    94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136,
+    171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122,
+    60, 211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+    1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116, 188, 159, 86,
+    164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126,
+    255, 82, 85, 212, 207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
+    119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253,
+    19, 98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193,
+    238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31,
+    181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93,
+    222, 114, 67, 29, 24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156, 180,
+] * 2, dtype=np.int32)
+
+def _perlin_octave1(x, repeat, base):
+    # 逐步按 float32 计算，与 noise 库 C 实现的 noise1 保持逐位一致
+    floor_x = np.floor(x)
+    i = np.fmod(floor_x.astype(np.int32), repeat)  # fmod 与 C 的 % 一样向零取整
+    ii = np.fmod(i + 1, repeat)
+    i = (i & 255) + base
+    ii = (ii & 255) + base
+    x = x - floor_x
+    fx = x * x * x * (x * (x * 6 - 15) + 10)
+    grad_a = _perlin_grad1(PERLIN_PERM[i], x)
+    grad_b = _perlin_grad1(PERLIN_PERM[ii], x - np.float32(1.0))
+    return (grad_a + fx * (grad_b - grad_a)) * np.float32(0.4)
+
+def _perlin_grad1(hash_values, x):
+    gradient = np.where(hash_values & 8, np.float32(-1.0), (hash_values & 7).astype(np.float32) + np.float32(1.0))
+    return gradient * x
+
+# 随机流编号：同一种子下每种用途各用一条独立的随机流
+RNG_STREAM_SAND = 1
+RNG_STREAM_TREE = 2
+RNG_STREAM_TREE_HEIGHT = 3
+RNG_STREAM_LEAF_RADIUS = 4
+RNG_STREAM_LEAF_HEIGHT = 5
+RNG_STREAM_BIRCH = 6
+RNG_STREAM_DUNGEON = 7
+RNG_STREAM_DUNGEON_DEPTH = 8
+RNG_STREAM_ORE = 9
+RNG_STREAM_ORE_SHAPE = 10
+RNG_STREAM_CAVE = 11  # 洞穴每层噪声依次占一条
+
+_MASK64 = (1 << 64) - 1
+_STREAM_KEYS = {}  # (种子, 随机流) -> 混合后的流密钥
+_MIX_SHIFTS = (np.uint64(30), np.uint64(27), np.uint64(31), np.uint64(11))
+_MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB), np.uint64(0xD1B54A32D192ED03))
+
+def _mix64(z):
+    # splitmix64 的混合函数，uint64 数组上的乘法按 2^64 自然回绕
+    z = (z ^ (z >> _MIX_SHIFTS[0])) * _MIX_MULTIPLIERS[0]
+    z = (z ^ (z >> _MIX_SHIFTS[1])) * _MIX_MULTIPLIERS[1]
+    return z ^ (z >> _MIX_SHIFTS[2])
+
+def seeded_random(seed, stream, xs):
+    """按 (世界种子, 随机流, 列坐标) 算出的 [0, 1) 均匀随机数。
+    
+    每个值只取决于这三个输入，与区块生成的先后顺序、批量大小、在哪个进程里生成都无关。
+    """
+    key = _STREAM_KEYS.get((seed, stream))
+    if key is None:
+        key = _mix64(np.array([(seed * 0x9E3779B97F4A7C15 + stream) & _MASK64], dtype=np.uint64))
+        _STREAM_KEYS[(seed, stream)] = key
+    z = _mix64(np.asarray(xs, dtype=np.int64).astype(np.uint64) * _MIX_MULTIPLIERS[2] + key)
+    return (z >> _MIX_SHIFTS[3]).astype(np.float64) * (1.0 / (1 << 53))
+
+def seeded_randint(seed, stream, xs, low, high):
+    """seeded_random 的整数版本，返回 [low, high] 闭区间内的整数（同 random.randint）"""
+    return low + (seeded_random(seed, stream, xs) * (high - low + 1)).astype(np.int64)
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+# 二维噪声晶格点可选的 8 个单位梯度
+NOISE_GRADIENTS = np.array([(np.cos(angle), np.sin(angle)) for angle in np.arange(8) * (np.pi / 4)], dtype=np.float32)
+_NOISE_WEIGHTS = {}  # 插值权重矩阵的缓存
+
+def _noise_x_weights(scale):
+    # 沿 x：晶格内第 k 列 = a左·fx·(1-wx) + b左·(1-wx) + a右·(fx-1)·wx + b右·wx，形状 (scale, 4)
+    weights = _NOISE_WEIGHTS.get(scale)
+    if weights is None:
+        fx = np.arange(scale, dtype=np.float32) / scale
+        wx = _fade(fx)
+        weights = _NOISE_WEIGHTS[scale] = np.stack([fx * (1 - wx), 1 - wx, (fx - 1) * wx, wx], axis=1)
+    return weights
+
+def _noise_y_weights(scale, y0, y1):
+    # 沿 y：(晶格行 × 行) 的权重矩阵，梯度 x 分量乘 wa、y 分量乘 wb（已乘上 y 方向的位移）
+    weights = _NOISE_WEIGHTS.get((scale, y0, y1))
+    if weights is None:
+        ys = np.arange(y0, y1)
+        j0 = y0 // scale
+        jy = ys // scale - j0
+        fy = ((ys % scale) / scale).astype(np.float32)
+        wy = _fade(fy)
+        rows = np.arange(len(ys))
+        wa = np.zeros((jy[-1] + 2, len(ys)), dtype=np.float32)
+        wb = np.zeros_like(wa)
+        wa[jy, rows] = 1 - wy
+        wa[jy + 1, rows] = wy
+        wb[jy, rows] = (1 - wy) * fy
+        wb[jy + 1, rows] = wy * (fy - 1)
+        weights = _NOISE_WEIGHTS[(scale, y0, y1)] = (j0, wa, wb)
+    return weights
+
+def gradient_noise2(seed, stream, x0, x1, y0, y1, scale):
+    """二维梯度（柏林）噪声在 [x0, x1) 列 × [y0, y1) 行上的值，大约在 [-1, 1]，返回形状 (x1 - x0, y1 - y0)。
+    
+    scale 是一个晶格跨的格数（整数），晶格点的梯度只由 (种子, 随机流, 晶格坐标) 决定。
+    两个方向的插值权重都只跟格子在晶格里的位置有关，所以整个插值就是两次矩阵乘法：
+    先沿 y 把每个晶格列插值成一行，再把每个晶格左右两列乘上 (scale × 4) 的权重得到中间的 scale 列。
+    """
+    i0, i1 = x0 // scale, -(-x1 // scale)
+    j0, wa, wb = _noise_y_weights(scale, y0, y1)
+    keys = (np.arange(i0, i1 + 1)[:, None] << 20) ^ (np.arange(j0, j0 + len(wa)) & 0xFFFFF)
+    gradients = NOISE_GRADIENTS[(seeded_random(seed, stream, keys) * len(NOISE_GRADIENTS)).astype(np.int64)]
+    a = gradients[..., 0] @ wa  # (晶格列, 行)
+    b = gradients[..., 1] @ wb
+    corners = np.stack([a[:-1], b[:-1], a[1:], b[1:]], axis=1)
+    noise = np.matmul(_noise_x_weights(scale), corners)  # (晶格, scale, 行)
+    return noise.reshape(-1, y1 - y0)[x0 - i0 * scale:x1 - i0 * scale]
+
+def _tree_template(tree_height, leaf_radius, leaf_height):
+    """一棵树的模板：(树叶遮罩, 树干遮罩)，左上角在 (树干列 - 半径, 树冠顶)，树干底在模板最下一行"""
+    width = 2 * leaf_radius + 1
+    height = leaf_height + tree_height
+    dx = np.arange(width)[:, None] - leaf_radius
+    dy = np.arange(height)[None, :] - leaf_height  # 相对树冠中心
+    leaves = (dy <= 0) & (np.sqrt(dx * dx + dy * dy) <= leaf_radius)
+    trunk = np.zeros((width, height), dtype=bool)
+    trunk[leaf_radius, height - tree_height:] = True
+    return leaves, trunk
+
+# 所有 (树高, 树冠半径, 树冠高度) 组合的模板预先算好
+TREE_TEMPLATES = {(tree_height, leaf_radius, leaf_height): _tree_template(tree_height, leaf_radius, leaf_height)
+                  for tree_height in range(4, 7) for leaf_radius in range(3, 5) for leaf_height in range(3, 5)}
+
+def _dungeon_template():
+    """地牢模板：石砖外墙、圆石地板，里面是空气"""
+    template = np.full((9, 6), BLOCK_IDS["stone_bricks"], dtype=BLOCK_ID_DTYPE)
+    template[:, -1] = BLOCK_IDS["cobblestone"]
+    template[1:-1, 1:-1] = AIR
+    return template
+
+DUNGEON_TEMPLATE = _dungeon_template()
+
+ORE_IDS = np.array([BLOCK_IDS[ore] for ore, _, _, _ in ORE_VEINS], dtype=BLOCK_ID_DTYPE)
+ORE_HOSTS = np.array([BLOCK_IDS[host] for _, host, _, _ in ORE_VEINS], dtype=BLOCK_ID_DTYPE)
+ORE_MIN_DEPTHS = np.array([min_depth for _, _, min_depth, _ in ORE_VEINS])
+ORE_CHANCES = np.array([chance for _, _, _, chance in ORE_VEINS])
+# 矿脉形状：相对起点的偏移，形状 (种类, 格数, 2)；格数不足的形状重复起点补齐
+VEIN_SHAPES = np.array([
+    [(0, 0), (1, 0), (0, 1), (1, 1), (0, 0)],
+    [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)],
+    [(0, 0), (1, 0), (2, 0), (1, 1), (0, 0)],
+    [(0, 0), (0, 1), (1, 1), (1, 2), (-1, 0)],
+])
+# 生成时两侧多算的列数：伸进范围的树冠、地牢、矿脉都要能生成出来
+GENERATION_PAD = max(TREE_MAX_LEAF_RADIUS, DUNGEON_TEMPLATE.shape[0], 2)
+
+def stamp(blocks, x, y, template, mask, replace=None):
+    """把模板贴到 blocks 上，(x, y) 是模板左上角，超出数组的部分裁掉。
+    
+    只写 mask 为真的格子；给出 replace（按方块ID索引的布尔表）时只覆盖其中为真的方块。
+    """
+    width, height = mask.shape
+    bx0, by0 = max(x, 0), max(y, 0)
+    bx1, by1 = min(x + width, blocks.shape[0]), min(y + height, blocks.shape[1])
+    if bx0 >= bx1 or by0 >= by1:
+        return
+    target = blocks[bx0:bx1, by0:by1]
+    selected = mask[bx0 - x:bx1 - x, by0 - y:by1 - y]
+    if replace is not None:
+        selected = selected & replace[target]
+    if np.ndim(template):
+        target[selected] = template[bx0 - x:bx1 - x, by0 - y:by1 - y][selected]
+    else:
+        target[selected] = template
+
+def perlin_noise1(xs, octaves=1, persistence=0.5, lacunarity=2.0, repeat=1024, base=0):
+    """noise.pnoise1 的向量化版本：一次计算整个数组，结果与逐个调用 pnoise1 完全相同"""
+    xs = np.asarray(xs, dtype=np.float32)
+    persistence = np.float32(persistence)
+    lacunarity = np.float32(lacunarity)
+    freq = np.float32(1.0)
+    amp = np.float32(1.0)
+    max_amp = np.float32(0.0)
+    freqs, repeats, amps = [], [], []
+    for _ in range(octaves):
+        freqs.append(freq)
+        repeats.append(int(repeat * freq))
+        amps.append(amp)
+        max_amp += amp
+        freq *= lacunarity
+        amp *= persistence
+    # 所有八度叠成一个 (八度, 列) 数组一起算，再按原来的顺序逐个累加，保持逐位一致
+    layers = _perlin_octave1(xs[None, :] * np.array(freqs, dtype=np.float32)[:, None],
+                             np.array(repeats, dtype=np.int32)[:, None], base)
+    layers *= np.array(amps, dtype=np.float32)[:, None]
+    total = np.zeros_like(xs)
+    for layer in layers:
+        total += layer
+    return total / max_amp
 
 # 加载方块贴图
 def load_images():
     images = {}
-    for filename in os.listdir("assets"):
+    for filename in os.listdir(ASSETS_DIR):
         if filename.endswith(".png"):
             name = filename[:-4]  # 移除.png后缀
-            image = pygame.image.load(os.path.join("assets", filename)).convert_alpha()
+            image = pygame.image.load(os.path.join(ASSETS_DIR, filename)).convert_alpha()
             
             if name == "cursor" or name.startswith("dig"):
                 # 获取原始尺寸
@@ -88,166 +428,1753 @@ def load_images():
                 images[name] = pygame.transform.scale(image, (new_width, new_height))
             else:
                 images[name] = pygame.transform.scale(image, (TILE_SIZE, TILE_SIZE))
+    # 贴图名和方块名不同的方块（如 coal_ore 用 "coal ore.png"）也能按方块名找到贴图
+    for block_type, texture in BLOCK_TEXTURES.items():
+        if texture in images:
+            images.setdefault(block_type, images[texture])
     return images
 
+def darkness_overlays():
+    """按光照等级预先做好的半透明黑色遮罩，光照 0 直接涂黑、满光照不画，所以只有中间的等级"""
+    overlays = [None] * (MAX_LIGHT + 1)
+    for level in range(1, MAX_LIGHT):
+        overlay = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        overlay.set_alpha(255 * (MAX_LIGHT - level) // MAX_LIGHT)
+        overlays[level] = overlay
+    return overlays
+
+def blit_tiles(surface, tiles, darkness, blocks, light, left, top):
+    """把方块ID数组 blocks 按光照 light 画到 surface 上，(left, top) 是第一格的左上角，返回贴图次数"""
+    blits = 0
+    for local_x, local_y in np.argwhere((blocks != AIR) | (light < MAX_LIGHT)):
+        level = light[local_x, local_y]
+        position = (left + local_x * TILE_SIZE, top + local_y * TILE_SIZE)
+        if level == 0:
+            surface.fill((0, 0, 0), (position, (TILE_SIZE, TILE_SIZE)))
+            continue
+        tile = tiles[blocks[local_x, local_y]]
+        if tile is not None:
+            surface.blit(tile, position)
+            blits += 1
+        if level < MAX_LIGHT:
+            surface.blit(darkness[level], position)
+            blits += 1
+    return blits
+
+def block_tiles(images):
+    """按方块ID索引的贴图列表，没有贴图的方块是 None，渲染时一次下标就能拿到贴图"""
+    textures = [images.get(name) for name in TEXTURE_NAMES]
+    return [None] + [textures[TEXTURE_LOOKUP[block_id]] for block_id in range(1, len(BLOCK_NAMES))]
+
+class SpriteCache:
+    """按 (图片名, 目标尺寸) 缓存缩放后的贴图：每种缩放只做一次，超出容量时淘汰最久未用的"""
+    def __init__(self, images, max_size=SPRITE_CACHE_SIZE):
+        self.images = images
+        self.max_size = max_size
+        self.scaled = OrderedDict()
+    
+    def __contains__(self, name):
+        return name in self.images
+    
+    def get(self, name, size):
+        key = (name, size)
+        sprite = self.scaled.get(key)
+        if sprite is None:
+            sprite = self.scaled[key] = pygame.transform.scale(self.images[name], size)
+            if len(self.scaled) > self.max_size:
+                self.scaled.popitem(last=False)
+        else:
+            self.scaled.move_to_end(key)
+        return sprite
+
+class Hotbar:
+    """物品栏图层：整体画到一张缓存图上，只有物品或选中格变化时才重画"""
+    def __init__(self, sprites):
+        self.sprites = sprites
+        self.hotbar_x = (WINDOW_WIDTH - HOTBAR_IMAGE.get_width()) // 2
+        self.hotbar_y = WINDOW_HEIGHT - HOTBAR_IMAGE.get_height() - HOTBAR_Y_OFFSET
+        # 缓存图从物品栏上方留一点余量开始，一直到窗口底部
+        self.top = self.hotbar_y - SLOT_SIZE
+        self.surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT - self.top), pygame.SRCALPHA)
+        self.state = None  # 上次绘制时的 (各物品数量, 选中格)
+        
+        # 字体只在启动时创建一次，数量文字的渲染结果（文字和阴影）也缓存起来
+        self.font = pygame.font.Font(None, int(SLOT_SIZE * 2))  # 增大字体大小
+        self.count_texts = OrderedDict()  # 数量文字 -> (文字图, 阴影图)
+    
+    def draw(self, screen, player):
+        state = (tuple(player.inventory[block_type] for block_type in BLOCK_TYPES), player.selected_block)
+        if state != self.state:
+            self.state = state
+            self.compose(player)
+        screen.blit(self.surface, (0, self.top))
+    
+    def render_count(self, count_text):
+        rendered = self.count_texts.get(count_text)
+        if rendered is None:
+            rendered = self.count_texts[count_text] = (self.font.render(count_text, True, (255, 255, 255)),
+                                                       self.font.render(count_text, True, (0, 0, 0)))
+            if len(self.count_texts) > SPRITE_CACHE_SIZE:
+                self.count_texts.popitem(last=False)
+        return rendered
+    
+    def compose(self, player):
+        surface = self.surface
+        surface.fill((0, 0, 0, 0))
+        # 以下坐标都相对于缓存图左上角
+        hotbar_x = self.hotbar_x
+        hotbar_y = self.hotbar_y - self.top
+        surface.blit(HOTBAR_IMAGE, (hotbar_x, hotbar_y))
+        
+        # 绘制物品栏中的方块
+        visible_slots = 0  # 跟踪可见的物品槽数量
+        for i, block_type in enumerate(BLOCK_TYPES):
+            if block_type in self.sprites and player.inventory[block_type] > 0:  # 只显示拥有的物品
+                # 为第一个和第二个物品特别处理
+                if visible_slots == 0:
+                    slot_x = hotbar_x + HOTBAR_PADDING
+                elif visible_slots == 1:
+                    # 第二个物品使用更大的间距
+                    slot_x = hotbar_x + HOTBAR_PADDING + (int(SLOT_SIZE * 6.0))
+                else:
+                    # 其他物品使用固定间距
+                    slot_x = hotbar_x + HOTBAR_PADDING + (int(SLOT_SIZE * 4.0) * visible_slots)
+                
+                slot_y = hotbar_y + HOTBAR_PADDING
+                
+                # 计算物品大小
+                item_size = int(SLOT_SIZE * ITEM_SCALE)
+                
+                # 计算物品位置
+                item_x = slot_x + ITEM_PADDING
+                item_y = slot_y + ITEM_VERTICAL_OFFSET
+                
+                # 绘制方块（缩放图从缓存取）
+                surface.blit(self.sprites.get(block_type, (item_size, item_size)), (item_x, item_y))
+                
+                # 绘制物品数量（增大字体）
+                text_surface, shadow_surface = self.render_count(str(player.inventory[block_type]))
+                text_rect = text_surface.get_rect()
+                
+                # 调整数字位置（右下角，稍微偏移以适应更大的字体）
+                text_rect.bottomright = (slot_x + SLOT_SIZE + 4, 
+                                       slot_y + SLOT_SIZE + 4)
+                
+                # 绘制文字阴影
+                surface.blit(shadow_surface, (text_rect.x + 2, text_rect.y + 2))  # 增大阴影偏移
+                surface.blit(text_surface, text_rect)
+                
+                # 绘制选中框
+                if i == player.selected_block:
+                    pygame.draw.rect(surface, (255, 255, 255), 
+                                   (slot_x, slot_y, 
+                                    SLOT_SIZE - 1, SLOT_SIZE - 1), 1)
+                
+                visible_slots += 1  # 增加可见槽位计数
+
+def view_chunk_range(camera):
+    """镜头视野覆盖的区块号范围 (最左, 最右)，含两端"""
+    left = int(camera.scroll_x // TILE_SIZE) // CHUNK_SIZE
+    right = int((camera.scroll_x + WINDOW_WIDTH) // TILE_SIZE) // CHUNK_SIZE
+    return left, right
+
 class Camera:
-    def __init__(self, width, height):
-        self.width = width
+    def __init__(self, height):
         self.height = height
         self.scroll_x = 0
         self.scroll_y = 0
     
-    def update(self, player):
-        self.scroll_x = player.x - (WINDOW_WIDTH // 2)
-        self.scroll_y = player.y - (WINDOW_HEIGHT // 2)
-        self.scroll_x = max(0, min(self.scroll_x, self.width - WINDOW_WIDTH))
+    def update(self, player, alpha=1.0):
+        # 横向不限制，世界向左右无限延伸
+        x, y = player.render_position(alpha)
+        self.scroll_x = x - (WINDOW_WIDTH // 2)
+        self.scroll_y = y - (WINDOW_HEIGHT // 2)
         self.scroll_y = max(0, min(self.scroll_y, self.height - WINDOW_HEIGHT))
 
-class DroppedItem:
-    def __init__(self, x, y, item_type):
+# 碰撞检测：轴分离的扫掠 AABB。
+# 沿移动方向检查路径上经过的每一行/列，而不只是终点所在的那一格，速度再大也不会穿过薄墙。
+# lookup 是按方块ID索引的布尔表，决定哪些方块会挡住这个实体；列表和 NumPy 数组都行，每步只查几格，用列表更快。
+# 每步移动通常不到一格，只经过一两列/行，所以逐格用 item 取 Python 整数查表，区块也只取一次。
+# 掉落物走同样的扫掠（sweep_x_boxes/sweep_y_boxes），只是一批盒子一起查，用 NumPy 查找表。
+
+def sweep_x(world, x, y, width, height, dx, lookup=SOLID_TABLE):
+    """盒子 [x, x+width) x [y, y+height) 水平移动 dx，返回 (新 x, 是否撞上)"""
+    if dx == 0:
+        return x, False
+    # 只看世界高度之内的行，越界不挡路
+    rows = range(max(int(y // TILE_SIZE), 0), min(int((y + height - 1) // TILE_SIZE), world.height - 1) + 1)
+    if dx > 0:
+        # 从右边缘现在所在的列开始，到终点右边缘碰到的那一列为止；
+        # 已经嵌进方块里一点的（比如跳起时脚陷进台阶）会被推回到方块外
+        column, last, step = int((x + width) // TILE_SIZE), int((x + width + dx) // TILE_SIZE), 1
+    else:
+        column, last, step = -int(-x // TILE_SIZE) - 1, -int(-(x + dx) // TILE_SIZE) - 1, -1
+    while column * step <= last * step:
+        chunk = world.chunks.get(column // CHUNK_SIZE) or world.get_chunk(column // CHUNK_SIZE)
+        blocks = chunk.blocks
+        local_x = column % CHUNK_SIZE
+        for row in rows:
+            if lookup[blocks.item(local_x, row)]:
+                return (column * TILE_SIZE - width if dx > 0 else (column + 1) * TILE_SIZE), True
+        column += step
+    return x + dx, False
+
+def sweep_y(world, x, y, width, height, dy, lookup=SOLID_TABLE):
+    """盒子竖直移动 dy（向下为正），返回 (新 y, 是否撞上)"""
+    if dy == 0:
+        return y, False
+    if dy > 0:
+        row, last, step = int((y + height) // TILE_SIZE), int((y + height + dy) // TILE_SIZE), 1
+    else:
+        row, last, step = -int(-y // TILE_SIZE) - 1, -int(-(y + dy) // TILE_SIZE) - 1, -1
+    # 盒子横跨的几列，区块先取好，逐行查时不再重复找
+    columns = []
+    for column in range(int(x // TILE_SIZE), int((x + width - 1) // TILE_SIZE) + 1):
+        chunk = world.chunks.get(column // CHUNK_SIZE) or world.get_chunk(column // CHUNK_SIZE)
+        columns.append((chunk.blocks, column % CHUNK_SIZE))
+    while row * step <= last * step:
+        if 0 <= row < world.height:
+            for blocks, local_x in columns:
+                if lookup[blocks.item(local_x, row)]:
+                    return (row * TILE_SIZE - height if dy > 0 else (row + 1) * TILE_SIZE), True
+        row += step
+    return y + dy, False
+
+def _sweep_boxes(world, first, last, step, moving, low, high, lookup, vertical):
+    """sweep_x_boxes 和 sweep_y_boxes 共用：每个移动中的盒子从前沿所在的线 first 逐条推进到 last（含），
+    每条线上检查 [low, high] 这几格（水平扫掠时线是列、格是行，竖直扫掠反过来）。返回 (撞上的线, 是否撞上)"""
+    line = first.copy()
+    hit = np.zeros(len(first), dtype=bool)
+    pending = np.flatnonzero(moving & (first * step <= last * step))
+    # 每轮查所有还在扫的盒子的下一条线；盒子跨的几格拼在一起，一次 block_ids_at 查完
+    while len(pending):
+        span = int((high[pending] - low[pending]).max()) + 1
+        cells = low[pending] + np.arange(span)[:, None]
+        lines = np.broadcast_to(line[pending], cells.shape)
+        ids = (world.block_ids_at(cells.ravel(), lines.ravel()) if vertical
+               else world.block_ids_at(lines.ravel(), cells.ravel()))
+        blocked = ((cells <= high[pending]) & lookup[ids].reshape(cells.shape)).any(axis=0)
+        hit[pending[blocked]] = True
+        pending = pending[~blocked & (line[pending] != last[pending])]
+        line[pending] += step[pending]
+    return line, hit
+
+def sweep_x_boxes(world, xs, ys, width, height, dxs, lookup=SOLID_LOOKUP):
+    """sweep_x 的向量化版：一批同样大小的盒子各自水平移动 dxs，返回 (新 x, 是否撞上)"""
+    right = dxs > 0
+    first = np.where(right, (xs + width) // TILE_SIZE, -(-xs // TILE_SIZE) - 1).astype(np.int64)
+    last = np.where(right, (xs + width + dxs) // TILE_SIZE, -(-(xs + dxs) // TILE_SIZE) - 1).astype(np.int64)
+    rows0 = (ys // TILE_SIZE).astype(np.int64)
+    rows1 = ((ys + height - 1) // TILE_SIZE).astype(np.int64)
+    column, hit = _sweep_boxes(world, first, last, np.where(right, 1, -1), dxs != 0, rows0, rows1, lookup, False)
+    stop = np.where(right, column * TILE_SIZE - width, (column + 1) * TILE_SIZE)
+    return np.where(hit, stop, xs + dxs), hit
+
+def sweep_y_boxes(world, xs, ys, width, height, dys, lookup=SOLID_LOOKUP):
+    """sweep_y 的向量化版：一批同样大小的盒子各自竖直移动 dys（向下为正），返回 (新 y, 是否撞上)"""
+    down = dys > 0
+    first = np.where(down, (ys + height) // TILE_SIZE, -(-ys // TILE_SIZE) - 1).astype(np.int64)
+    last = np.where(down, (ys + height + dys) // TILE_SIZE, -(-(ys + dys) // TILE_SIZE) - 1).astype(np.int64)
+    columns0 = (xs // TILE_SIZE).astype(np.int64)
+    columns1 = ((xs + width - 1) // TILE_SIZE).astype(np.int64)
+    row, hit = _sweep_boxes(world, first, last, np.where(down, 1, -1), dys != 0, columns0, columns1, lookup, True)
+    stop = np.where(down, row * TILE_SIZE - height, (row + 1) * TILE_SIZE)
+    return np.where(hit, stop, ys + dys), hit
+
+ITEM_FIELDS = ("x", "y", "prev_x", "prev_y", "velocity_x", "velocity_y", "bobbing", "item_type", "count", "asleep")
+
+def propagate_light(light, decay):
+    """光照泛洪：按层推进的 BFS，每一轮所有格子同时取 max(自身, 相邻格 - 本格衰减)。
+    
+    light 是 (通道, 列, 行) 的初始光照（光源、直射阳光、固定的边界），decay 是每格的衰减 (列, 行)。
+    光每走一格至少减 1，所以最多 MAX_LIGHT 轮就稳定，提前稳定就提前结束。
+    """
+    neighbor = np.empty_like(light)
+    for _ in range(MAX_LIGHT):
+        neighbor[:, 0] = light[:, 1]
+        neighbor[:, -1] = light[:, -2]
+        np.maximum(light[:, :-2], light[:, 2:], out=neighbor[:, 1:-1])
+        np.maximum(neighbor[:, :, 1:], light[:, :, :-1], out=neighbor[:, :, 1:])
+        np.maximum(neighbor[:, :, :-1], light[:, :, 1:], out=neighbor[:, :, :-1])
+        neighbor -= decay
+        if not (neighbor > light).any():
+            break
+        np.maximum(light, neighbor, out=light)
+    return light
+
+def fluid_step(ids, kind):
+    """流体元胞自动机的一步。ids 是一块区域的方块ID，返回去掉最外一圈后内圈的新ID。
+    
+    源头不变；空气和同种流动的流体格重新取等级：上方有同种流体为 1 级，
+    否则取左右两侧能横向流动的邻格等级 + 1 中最小的，超过最大等级就变回空气。
+    流体只有下方被挡住时才横向流动。岩浆碰到水，源头变黑曜石，流动的变圆石。
+    """
+    max_level = FLUIDS[FLUID_TYPES[kind - 1]]["max_level"]
+    fluid = FLUID_KIND_LOOKUP[ids] == kind
+    level = FLUID_LEVEL_LOOKUP[ids]
+    source = fluid & (level == 0)
+    open_cells = (ids == AIR) | (fluid & ~source)  # 可以被这种流动的流体占据的格子
+    spreads = fluid[:, :-1] & ~open_cells[:, 1:]  # 下方被挡住、可以横流的流体格
+    
+    inner = ids[1:-1, 1:-1]
+    no_flow = max_level + 1
+    candidate = np.where(fluid[1:-1, :-2], 1, no_flow)
+    candidate = np.minimum(candidate, np.where(spreads[:-2, 1:], level[:-2, 1:-1] + 1, no_flow))
+    candidate = np.minimum(candidate, np.where(spreads[2:, 1:], level[2:, 1:-1] + 1, no_flow))
+    flowing = candidate <= max_level
+    new = np.where(open_cells[1:-1, 1:-1] & flowing, FLUID_BLOCK_IDS[kind, np.minimum(candidate, max_level)], inner)
+    new = np.where(open_cells[1:-1, 1:-1] & fluid[1:-1, 1:-1] & ~flowing, AIR, new).astype(BLOCK_ID_DTYPE)
+    
+    # 岩浆和水相邻时凝固
+    water = FLUID_KIND_LOOKUP[ids] == WATER
+    touches_water = water[:-2, 1:-1] | water[2:, 1:-1] | water[1:-1, :-2] | water[1:-1, 2:]
+    lava = (FLUID_KIND_LOOKUP[new] == LAVA) & touches_water
+    new[lava & (FLUID_LEVEL_LOOKUP[new] == 0)] = BLOCK_IDS["obsidian"]
+    new[lava & (FLUID_LEVEL_LOOKUP[new] > 0)] = BLOCK_IDS["cobblestone"]
+    return new
+
+class ItemStore:
+    """掉落物的结构数组存储：每个属性一个 NumPy 数组，一次物理步进更新全部掉落物。
+    
+    落地且停稳的掉落物会进入休眠，不再参与物理计算，直到附近的方块发生变化。
+    """
+    def __init__(self, capacity=64, rng=None):
+        self.rng = rng if rng is not None else random.Random()  # 初始速度的随机源，世界传入按种子播种的，回放才能重现
+        self.size = 0  # 当前掉落物数量，数组中 [0, size) 部分有效
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)  # 上一步的位置，渲染时在两步之间插值
+        self.prev_y = np.zeros(capacity)
+        self.velocity_x = np.zeros(capacity)
+        self.velocity_y = np.zeros(capacity)
+        self.bobbing = np.zeros(capacity)  # 上下浮动动画的相位
+        self.item_type = np.zeros(capacity, dtype=BLOCK_ID_DTYPE)  # 物品的方块ID
+        self.count = np.zeros(capacity, dtype=np.int64)  # 每一堆的数量
+        self.asleep = np.zeros(capacity, dtype=bool)
+        self.blits = 0  # 上一次 draw 的贴图次数，给性能统计用
+    
+    def __len__(self):
+        return self.size
+    
+    def _grow(self):
+        for name in ITEM_FIELDS:
+            array = getattr(self, name)
+            grown = np.zeros(len(array) * 2, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+    
+    def spawn(self, x, y, item_type, count=1):
+        if self.size == len(self.x):
+            self._grow()
+        i = self.size
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.velocity_x[i] = self.rng.uniform(-2, 2)  # 随机水平速度
+        self.velocity_y[i] = -4  # 向上的初始速度
+        self.bobbing[i] = 0
+        self.item_type[i] = BLOCK_IDS[item_type]
+        self.count[i] = count
+        self.asleep[i] = False
+        self.size += 1
+    
+    def remove(self, indices):
+        """一次性删除一批掉落物，剩下的按原顺序压紧"""
+        if len(indices) == 0:
+            return
+        keep = np.ones(self.size, dtype=bool)
+        keep[indices] = False
+        kept = int(keep.sum())
+        for name in ITEM_FIELDS:
+            array = getattr(self, name)
+            array[:kept] = array[:self.size][keep]
+        self.size = kept
+    
+    def wake_near(self, x, y):
+        """方块 (x, y) 变化后唤醒周围一格内休眠的掉落物"""
+        n = self.size
+        tile_x = self.x[:n] // TILE_SIZE
+        tile_y = (self.y[:n] + ITEM_SIZE) // TILE_SIZE
+        self.asleep[:n] &= ~((np.abs(tile_x - x) <= 1) & (np.abs(tile_y - y) <= 1))
+    
+    def wake_rect(self, x0, y0, x1, y1):
+        """方块矩形 [x0, x1) x [y0, y1) 成片变化后唤醒其中和周围一格内休眠的掉落物"""
+        n = self.size
+        tile_x = self.x[:n] // TILE_SIZE
+        tile_y = (self.y[:n] + ITEM_SIZE) // TILE_SIZE
+        self.asleep[:n] &= ~((tile_x >= x0 - 1) & (tile_x <= x1) & (tile_y >= y0 - 1) & (tile_y <= y1))
+    
+    def step(self, world):
+        n = self.size
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.bobbing[:n] += ITEM_BOBBING_SPEED  # 浮动动画
+        
+        # 只更新醒着、且所在区块已加载的掉落物（卸载区块里的掉落物暂停更新）
+        active = ~self.asleep[:n] & world.chunks_loaded_at(self.x[:n] // TILE_SIZE // CHUNK_SIZE)
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            return
+        
+        # 应用重力，和玩家一样先水平、后竖直地扫掠移动：水平撞上实心方块就停下，
+        # 竖直方向和以前一样碰到任何非空气、非液体的方块就落在上面（撞到头顶也停下）
+        self.velocity_y[idx] += ITEM_GRAVITY
+        x, hit_wall = sweep_x_boxes(world, self.x[idx], self.y[idx], ITEM_SIZE, ITEM_SIZE, self.velocity_x[idx])
+        self.velocity_x[idx[hit_wall]] = 0
+        y, hit = sweep_y_boxes(world, x, self.y[idx], ITEM_SIZE, ITEM_SIZE, self.velocity_y[idx],
+                               ITEM_COLLISION_LOOKUP)
+        landed = hit & (self.velocity_y[idx] > 0)
+        self.velocity_y[idx[hit]] = 0
+        self.velocity_x[idx[landed]] *= ITEM_FRICTION  # 摩擦力
+        self.x[idx] = x
+        self.y[idx] = y
+        
+        # 落地后水平速度也几乎为零的掉落物进入休眠
+        settled = idx[landed & (np.abs(self.velocity_x[idx]) < ITEM_SLEEP_SPEED)]
+        self.velocity_x[settled] = 0
+        self.asleep[settled] = True
+    
+    def merge(self):
+        """同一格里的同类掉落物合并成一堆"""
+        n = self.size
+        if n < 2:
+            return
+        cell_x = (self.x[:n] // ITEM_CELL_SIZE).astype(np.int64)
+        cell_y = (self.y[:n] // ITEM_CELL_SIZE).astype(np.int64)
+        item_type = self.item_type[:n]
+        order = np.lexsort((item_type, cell_y, cell_x))
+        # 排序后 (格子, 类型) 相同的掉落物相邻，每组第一个是保留下来的那一堆
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = ((np.diff(cell_x[order]) != 0) | (np.diff(cell_y[order]) != 0) |
+                         (np.diff(item_type[order].astype(np.int64)) != 0))
+        if new_group.all():
+            return
+        starts = np.flatnonzero(new_group)
+        keepers = order[starts]
+        self.count[keepers] = np.add.reduceat(self.count[:n][order], starts)
+        self.asleep[keepers] &= np.logical_and.reduceat(self.asleep[:n][order], starts)
+        self.remove(order[~new_group])
+    
+    def collect(self, player):
+        """把拾取范围内的掉落物放进玩家物品栏"""
+        n = self.size
+        dx = self.x[:n] + ITEM_SIZE / 2 - (player.x + player.width / 2)
+        dy = self.y[:n] + ITEM_SIZE / 2 - (player.y + player.height / 2)
+        # 比较距离的平方，省去开方
+        picked = np.flatnonzero(dx * dx + dy * dy < player.pickup_range * player.pickup_range)
+        for i in picked:
+            player.pickup_item(BLOCK_NAMES[self.item_type[i]], int(self.count[i]))
+        self.remove(picked)
+    
+    def draw(self, screen, camera, sprites, alpha=1.0):
+        n = self.size
+        # 计算屏幕位置（在上一步和这一步之间插值），只画屏幕内的
+        x = self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * alpha
+        y = self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha
+        screen_x = x - camera.scroll_x
+        screen_y = y - camera.scroll_y + np.sin(self.bobbing[:n]) * 3  # 添加上下浮动
+        visible = np.flatnonzero((screen_x > -ITEM_SIZE - 3) & (screen_x < WINDOW_WIDTH) &
+                                 (screen_y > -ITEM_SIZE) & (screen_y < WINDOW_HEIGHT + 3))
+        self.blits = len(visible) + int(np.count_nonzero(self.count[visible] > 1))
+        for i in visible:
+            item_type = BLOCK_NAMES[self.item_type[i]]
+            if item_type in sprites:
+                # 缩放后的物品图像由缓存提供
+                sprite = sprites.get(item_type, (ITEM_SIZE, ITEM_SIZE))
+                if self.count[i] > 1:
+                    # 多个物品堆在一起时在后面多画一个，看起来像一堆
+                    screen.blit(sprite, (screen_x[i] + 3, screen_y[i] - 3))
+                screen.blit(sprite, (screen_x[i], screen_y[i]))
+
+class BlockNameView:
+    """以方块名称读写世界的兼容层，支持 blocks[x][y] 和 blocks[x, y] 两种写法"""
+    def __init__(self, world):
+        self.world = world
+    
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.world.get_block(*key)
+        return BlockColumnView(self.world, key)
+    
+    def __setitem__(self, key, block_type):
+        self.world.set_block(key[0], key[1], block_type)
+
+class BlockColumnView:
+    def __init__(self, world, x):
+        self.world = world
+        self.x = x
+    
+    def __len__(self):
+        return self.world.height
+    
+    def __getitem__(self, y):
+        return self.world.get_block(self.x, y)
+    
+    def __setitem__(self, y, block_type):
+        self.world.set_block(self.x, y, block_type)
+
+def contiguous_runs(values):
+    """把升序整数列表切成连续区间，返回 [(开始, 结束), ...]，结束不含"""
+    runs = []
+    start = 0
+    for i in range(1, len(values) + 1):
+        if i == len(values) or values[i] != values[i - 1] + 1:
+            runs.append((values[start], values[i - 1] + 1))
+            start = i
+    return runs
+
+class Chunk:
+    """宽 CHUNK_SIZE 列、高度为整个世界高度的一段区块"""
+    def __init__(self, cx, height):
+        self.cx = cx
+        self.x0 = cx * CHUNK_SIZE  # 区块最左列的世界坐标
+        self.blocks = np.zeros((CHUNK_SIZE, height), dtype=BLOCK_ID_DTYPE)  # 按 [本地x, y] 索引
+        self.modified = False  # 与种子生成的结果不同，卸载时不能直接丢弃
+        self.tile_entities = {}  # 方块实体 (本地x, y) -> TileEntity，绝大多数区块是空的
+        self.light = np.zeros((2, CHUNK_SIZE, height), dtype=np.uint8)  # [天空光, 方块光]，不存盘，加载时重算
+
+class TileEntity:
+    """带状态的方块（箱子的物品、熔炉的燃料和进度）的基类，稀疏地存在所在区块里。
+    
+    只有 active() 为真的方块实体会被调度器每步调用 tick，闲置的不花任何时间。
+    """
+    kind = None
+    
+    def __init__(self, x, y):
         self.x = x
         self.y = y
-        self.item_type = item_type
-        self.velocity_x = random.uniform(-2, 2)  # 随机水平速度
-        self.velocity_y = -4  # 向上的初始速度
-        self.gravity = 0.4
-        self.size = TILE_SIZE // 2  # 掉落物大小是方块的一半
-        self.bobbing = 0  # 用于上下浮动动画
-        self.bobbing_speed = 0.1
     
-    def update(self, world):
-        # 应用重力
-        self.velocity_y += self.gravity
+    def active(self):
+        return False
+    
+    def tick(self, world):
+        """推进一步，返回 False 表示没事可做、进入休眠"""
+        return False
+    
+    def interact(self, world, player):
+        """玩家右键，返回状态是否改变"""
+        return False
+    
+    def contents(self):
+        """方块被破坏时掉出来的物品 [(名称, 数量), ...]"""
+        return []
+    
+    def encode(self, out):
+        pass
+    
+    @classmethod
+    def decode(cls, x, y, data, offset):
+        return cls(x, y), offset
+
+class Chest(TileEntity):
+    """箱子：右键把手里选中的方块放进去一个，破坏时全部掉出来。从不需要 tick"""
+    kind = "chest"
+    
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.items = {}  # 物品名称 -> 数量
+    
+    def interact(self, world, player):
+        item_type = player.get_selected_block()
+        if player.inventory[item_type] <= 0:
+            return False
+        if item_type not in self.items and len(self.items) >= CHEST_SLOTS:
+            return False
+        player.inventory[item_type] -= 1
+        self.items[item_type] = self.items.get(item_type, 0) + 1
+        return True
+    
+    def contents(self):
+        return list(self.items.items())
+    
+    def encode(self, out):
+        out.write(struct.pack("<B", len(self.items)))
+        for item_type, count in self.items.items():
+            _write_stack(out, item_type, count)
+    
+    @classmethod
+    def decode(cls, x, y, data, offset):
+        chest = cls(x, y)
+        count = data[offset]
+        offset += 1
+        for _ in range(count):
+            item_type, item_count, offset = _read_stack(data, offset)
+            chest.items[item_type] = item_count
+        return chest, offset
+
+class Furnace(TileEntity):
+    """熔炉：有燃料、有能烧的原料时才会醒着，烧的时候方块换成亮着的熔炉"""
+    kind = "furnace"
+    
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.input_type, self.input_count = None, 0
+        self.fuel_type, self.fuel_count = None, 0
+        self.output_type, self.output_count = None, 0
+        self.burn_time = 0  # 当前燃料还能烧的步数
+        self.progress = 0  # 当前原料已经烧了的步数
+    
+    def can_smelt(self):
+        if self.input_count == 0:
+            return False
+        return self.output_count == 0 or self.output_type == SMELTING_RECIPES[self.input_type]
+    
+    def active(self):
+        return self.burn_time > 0 or (self.fuel_count > 0 and self.can_smelt())
+    
+    def tick(self, world):
+        if self.burn_time == 0 and self.fuel_count > 0 and self.can_smelt():
+            # 点燃下一份燃料
+            self.burn_time = FURNACE_FUEL[self.fuel_type]
+            self.fuel_count -= 1
+            if self.fuel_count == 0:
+                self.fuel_type = None
+        lit = self.burn_time > 0
+        block_type = "furnace_lit" if lit else "furnace"
+        if world.get_block(self.x, self.y) != block_type:
+            world.set_block(self.x, self.y, block_type)
+        if not lit:
+            self.progress = 0
+            return False
         
-        # 更新位置
-        self.x += self.velocity_x
-        self.y += self.velocity_y
+        self.burn_time -= 1
+        if not self.can_smelt():
+            self.progress = 0
+        else:
+            self.progress += 1
+            if self.progress >= FURNACE_SMELT_TICKS:
+                self.progress = 0
+                self.output_type = SMELTING_RECIPES[self.input_type]
+                self.output_count += 1
+                self.input_count -= 1
+                if self.input_count == 0:
+                    self.input_type = None
+        return True
+    
+    def interact(self, world, player):
+        # 有产物时先把产物交给玩家，否则把选中的方块当燃料或原料放进去
+        if self.output_count > 0:
+            player.pickup_item(self.output_type, self.output_count)
+            self.output_type, self.output_count = None, 0
+            return True
+        item_type = player.get_selected_block()
+        if player.inventory[item_type] <= 0:
+            return False
+        if item_type in FURNACE_FUEL and self.fuel_type in (None, item_type):
+            self.fuel_type = item_type
+            self.fuel_count += 1
+        elif item_type in SMELTING_RECIPES and self.input_type in (None, item_type):
+            self.input_type = item_type
+            self.input_count += 1
+        else:
+            return False
+        player.inventory[item_type] -= 1
+        return True
+    
+    def contents(self):
+        stacks = [(self.input_type, self.input_count), (self.fuel_type, self.fuel_count),
+                  (self.output_type, self.output_count)]
+        return [(item_type, count) for item_type, count in stacks if count > 0]
+    
+    def encode(self, out):
+        _write_stack(out, self.input_type, self.input_count)
+        _write_stack(out, self.fuel_type, self.fuel_count)
+        _write_stack(out, self.output_type, self.output_count)
+        out.write(struct.pack("<HH", self.burn_time, self.progress))
+    
+    @classmethod
+    def decode(cls, x, y, data, offset):
+        furnace = cls(x, y)
+        furnace.input_type, furnace.input_count, offset = _read_stack(data, offset)
+        furnace.fuel_type, furnace.fuel_count, offset = _read_stack(data, offset)
+        furnace.output_type, furnace.output_count, offset = _read_stack(data, offset)
+        furnace.burn_time, furnace.progress = struct.unpack_from("<HH", data, offset)
+        return furnace, offset + 4
+
+TILE_ENTITY_CLASSES = {cls.kind: cls for cls in (Chest, Furnace)}
+
+# 存档格式
+REGION_MAGIC = b"MC2R"
+LEVEL_MAGIC = b"MC2D"
+SAVE_VERSION = 3  # 3：地形生成加了洞穴、矿脉、地牢和白桦，delta 存档的差异基准跟着变了
+SAVE_MODES = ["full", "delta"]  # full 存整个区块；delta 只存与种子地形不同的格子
+REGION_HEADER = struct.Struct("<4sHH")  # 魔数, 版本, 每个区域的区块数
+REGION_TABLE_OFFSET = REGION_HEADER.size  # 之后是 REGION_SIZE 个 (偏移, 长度) 的 uint32 对
+
+def encode_chunk(blocks):
+    """把区块编码为 调色板 + 游程编码 的二进制：按列展开后同一方块的连续段只存一次"""
+    palette_ids, indices = np.unique(blocks, return_inverse=True)
+    flat = indices.reshape(-1).astype(np.uint8)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(flat)) + 1))
+    lengths = np.diff(np.concatenate((starts, [len(flat)])))
+    if lengths.max() > 0xFFFF:
+        raise ValueError("chunk too large for 16-bit run lengths")
+    out = io.BytesIO()
+    out.write(struct.pack("<HH", blocks.shape[0], blocks.shape[1]))
+    _write_palette(out, palette_ids)
+    out.write(struct.pack("<I", len(starts)))
+    out.write(lengths.astype("<u2").tobytes())
+    out.write(flat[starts].tobytes())
+    return out.getvalue()
+
+def decode_chunk(data):
+    data = memoryview(data)
+    width, height = struct.unpack_from("<HH", data, 0)
+    palette, offset = _read_palette(data, 4)
+    run_count, = struct.unpack_from("<I", data, offset)
+    offset += 4
+    lengths = np.frombuffer(data, dtype="<u2", count=run_count, offset=offset)
+    values = np.frombuffer(data, dtype=np.uint8, count=run_count, offset=offset + 2 * run_count)
+    return palette[np.repeat(values, lengths)].reshape(width, height), offset + 3 * run_count
+
+def encode_chunk_delta(blocks, base):
+    """只编码与 base（同一区块新生成的地形）不同的格子：格子下标 + 调色板下标"""
+    if blocks.size > 0x10000:
+        raise ValueError("chunk too large for 16-bit tile indices")
+    flat = blocks.reshape(-1)
+    changed = np.flatnonzero(flat != base.reshape(-1))
+    palette_ids, values = np.unique(flat[changed], return_inverse=True)
+    out = io.BytesIO()
+    out.write(struct.pack("<HH", blocks.shape[0], blocks.shape[1]))
+    _write_palette(out, palette_ids)
+    out.write(struct.pack("<I", len(changed)))
+    out.write(changed.astype("<u2").tobytes())
+    out.write(values.astype(np.uint8).tobytes())
+    return out.getvalue()
+
+def decode_chunk_delta(data, base):
+    data = memoryview(data)
+    width, height = struct.unpack_from("<HH", data, 0)
+    palette, offset = _read_palette(data, 4)
+    count, = struct.unpack_from("<I", data, offset)
+    offset += 4
+    changed = np.frombuffer(data, dtype="<u2", count=count, offset=offset)
+    values = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset + 2 * count)
+    blocks = base.reshape(-1).copy()
+    blocks[changed] = palette[values]
+    return blocks.reshape(width, height), offset + 3 * count
+
+def encode_tile_entities(tile_entities):
+    """区块里的方块实体：本地坐标 + 种类 + 各自的状态。没有方块实体时是空串"""
+    if not tile_entities:
+        return b""
+    out = io.BytesIO()
+    out.write(struct.pack("<H", len(tile_entities)))
+    for (local_x, y), entity in tile_entities.items():
+        out.write(struct.pack("<BH", local_x, y))
+        _write_str(out, entity.kind)
+        entity.encode(out)
+    return out.getvalue()
+
+def decode_tile_entities(data, offset, x0):
+    """读出方块实体，data 在 offset 处已经结束（旧存档、没有方块实体）时返回空表"""
+    tile_entities = {}
+    if offset >= len(data):
+        return tile_entities
+    count, = struct.unpack_from("<H", data, offset)
+    offset += 2
+    for _ in range(count):
+        local_x, y = struct.unpack_from("<BH", data, offset)
+        kind, offset = _read_str(data, offset + 3)
+        tile_entities[(local_x, y)], offset = TILE_ENTITY_CLASSES[kind].decode(x0 + local_x, y, data, offset)
+    return tile_entities
+
+def _write_palette(out, block_ids):
+    out.write(struct.pack("<B", len(block_ids)))
+    for block_id in block_ids:
+        # 调色板里存方块名称而不是ID，方块表调整后旧存档仍能读出
+        _write_str(out, BLOCK_NAMES[block_id] or "air")
+
+def _read_palette(data, offset):
+    palette = np.zeros(data[offset], dtype=BLOCK_ID_DTYPE)
+    offset += 1
+    for i in range(len(palette)):
+        name, offset = _read_str(data, offset)
+        palette[i] = AIR if name == "air" else BLOCK_IDS[name]
+    return palette, offset
+
+def _write_str(out, text):
+    encoded = text.encode("utf-8")
+    out.write(struct.pack("<B", len(encoded)))
+    out.write(encoded)
+
+def _read_str(data, offset):
+    length = data[offset]
+    return bytes(data[offset + 1:offset + 1 + length]).decode("utf-8"), offset + 1 + length
+
+def _write_stack(out, item_type, count):
+    # 一格物品：名称 + 数量，空格子的名称是空串
+    _write_str(out, item_type or "")
+    out.write(struct.pack("<I", count))
+
+def _read_stack(data, offset):
+    item_type, offset = _read_str(data, offset)
+    count, = struct.unpack_from("<I", data, offset)
+    return item_type or None, count, offset + 4
+
+class RegionFile:
+    """一个区域文件：文件头的偏移表指向各个区块的数据，读取通过内存映射只碰需要的字节"""
+    def __init__(self, path):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(REGION_HEADER.pack(REGION_MAGIC, SAVE_VERSION, REGION_SIZE))
+                f.write(bytes(8 * REGION_SIZE))
+        self.file = open(path, "r+b")
+        magic, version, region_size = REGION_HEADER.unpack(self.file.read(REGION_HEADER.size))
+        if magic != REGION_MAGIC or region_size != REGION_SIZE:
+            raise ValueError(f"not a region file: {path}")
+        self.table = np.frombuffer(self.file.read(8 * REGION_SIZE), dtype="<u4").reshape(REGION_SIZE, 2).copy()
+        self.map = None
+    
+    def has(self, index):
+        return self.table[index, 1] > 0
+    
+    def read(self, index):
+        offset, length = (int(v) for v in self.table[index])
+        if length == 0:
+            return None
+        if self.map is None or len(self.map) < offset + length:
+            # 文件变长后重新映射
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map[offset:offset + length]
+    
+    def write(self, index, payload):
+        offset, length = (int(v) for v in self.table[index])
+        if len(payload) > length:
+            # 原位置放不下就追加到文件末尾
+            self.file.seek(0, os.SEEK_END)
+            offset = self.file.tell()
+        self.file.seek(offset)
+        self.file.write(payload)
+        self.table[index] = (offset, len(payload))
+        self.file.seek(REGION_TABLE_OFFSET + 8 * index)
+        self.file.write(self.table[index].astype("<u4").tobytes())
+    
+    def flush(self):
+        self.file.flush()
+    
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+class RegionStore:
+    """按需打开区域文件，按区块坐标读写区块。
+    
+    给出 base(cx) 时为 delta 模式：区块只存与 base 返回的种子地形不同的格子。
+    """
+    def __init__(self, directory, base=None):
+        self.directory = directory
+        self.base = base
+        os.makedirs(directory, exist_ok=True)
+        self.regions = {}  # 区域编号 -> RegionFile
+        self.lock = threading.Lock()  # 主线程读取和存档线程写入可能同时发生
+    
+    def region_for(self, cx, create):
+        rx = cx // REGION_SIZE
+        region = self.regions.get(rx)
+        if region is None:
+            path = os.path.join(self.directory, f"r.{rx}.mcr")
+            if not create and not os.path.exists(path):
+                return None
+            region = self.regions[rx] = RegionFile(path)
+        return region
+    
+    def has_chunk(self, cx):
+        with self.lock:
+            region = self.region_for(cx, create=False)
+            return region is not None and region.has(cx % REGION_SIZE)
+    
+    def read_chunk(self, cx, base=None):
+        """读出区块的 (方块数组, 方块实体表)；delta 模式下可以传入已经生成好的种子地形 base，省去再生成一次"""
+        with self.lock:
+            region = self.region_for(cx, create=False)
+            data = region.read(cx % REGION_SIZE) if region is not None else None
+        if data is None:
+            return None
+        if self.base is not None:
+            blocks, offset = decode_chunk_delta(data, base if base is not None else self.base(cx))
+        else:
+            blocks, offset = decode_chunk(data)
+        return blocks, decode_tile_entities(data, offset, cx * CHUNK_SIZE)
+    
+    def write_chunk(self, cx, blocks, tile_data=b""):
+        """写入区块，tile_data 是 encode_tile_entities 编好的方块实体，接在方块数据后面"""
+        # 编码不需要持锁
+        if self.base is not None:
+            payload = encode_chunk_delta(blocks, self.base(cx))
+        else:
+            payload = encode_chunk(blocks)
+        payload += tile_data
+        with self.lock:
+            self.region_for(cx, create=True).write(cx % REGION_SIZE, payload)
+    
+    def flush(self):
+        with self.lock:
+            for region in self.regions.values():
+                region.flush()
+    
+    def close(self):
+        with self.lock:
+            for region in self.regions.values():
+                region.close()
+            self.regions.clear()
+
+class Autosaver:
+    """后台存档线程。主线程只提交脏区块的快照，编码和磁盘写入都在这个线程里完成，
+    主循环从不等待磁盘。"""
+    def __init__(self, regions, level_path):
+        self.regions = regions
+        self.level_path = level_path
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending = {}  # 等待写入的区块快照 cx -> (方块数组, 方块实体数据)，写完之前读区块要先查这里
+        self.pending_level = None  # 等待写入的 level.dat 内容
+        self.writing = False
+        self.closed = False
+        self.thread = None
+    
+    def submit(self, chunks, level=None):
+        """提交一批区块快照（以及 level.dat），立即返回"""
+        with self.lock:
+            self.pending.update(chunks)
+            if level is not None:
+                self.pending_level = level
+            if self.thread is None:
+                # 第一次提交时才启动线程，预生成用的进程池 fork 时还没有后台线程
+                self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+                self.thread.start()
+            self.changed.notify_all()
+    
+    def pending_chunk(self, cx):
+        with self.lock:
+            return self.pending.get(cx)
+    
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending and self.pending_level is None and not self.closed:
+                    self.changed.wait()
+                if not self.pending and self.pending_level is None:
+                    return
+                chunks = dict(self.pending)
+                level, self.pending_level = self.pending_level, None
+                self.writing = True
+            
+            for cx, (blocks, tile_data) in chunks.items():
+                self.regions.write_chunk(cx, blocks, tile_data)
+            self.regions.flush()
+            if level is not None:
+                # 区块写完之后才替换 level.dat，崩溃后读到的玩家状态不会比区块更新
+                with open(self.level_path + ".tmp", "wb") as f:
+                    f.write(level)
+                os.replace(self.level_path + ".tmp", self.level_path)
+            
+            with self.lock:
+                # 写入期间又被提交了新快照的区块留到下一轮
+                for cx, snapshot in chunks.items():
+                    if self.pending.get(cx) is snapshot:
+                        del self.pending[cx]
+                self.writing = False
+                self.changed.notify_all()
+    
+    def wait(self):
+        """等待已提交的内容全部写完"""
+        with self.lock:
+            while self.thread is not None and (self.pending or self.pending_level is not None or self.writing):
+                self.changed.wait()
+    
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.changed.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+class TerrainGenerator:
+    """只由世界种子决定的地形生成器，可以传给工作进程并行生成区块"""
+    def __init__(self, seed, height):
+        self.seed = seed
+        self.height = height
+        self.noise_base = seed & 255  # 柏林噪声置换表偏移
+        self.noise_offset = ((seed >> 8) % 1024) * int(TERRAIN_SCALE)  # 噪声采样的列偏移
+    
+    def generate_chunks(self, cx0, cx1):
+        return self.generate_terrain(cx0 * CHUNK_SIZE, cx1 * CHUNK_SIZE)
+    
+    def generate_chunk(self, cx):
+        return self.generate_chunks(cx, cx + 1)
+    
+    def generate_terrain(self, x0, x1):
+        """生成 [x0, x1) 列的完整地形，返回方块ID数组。
         
-        # 检查与方块的碰撞
-        block_x = int(self.x // TILE_SIZE)
-        block_y = int((self.y + self.size) // TILE_SIZE)
+        分几遍生成：地层 -> 洞穴 -> 矿脉 -> 地牢 -> 树。每一格的结果只取决于种子和它的坐标。
+        """
+        # 左右多算几列，让范围外的树冠、地牢、矿脉伸进来的部分也能生成
+        pad = GENERATION_PAD
+        blocks, heights = self.generate_columns(x0 - pad, x1 + pad)
+        # 洞穴只在范围内挖（两侧多算的列最后会被丢掉，不用挖）
+        self.carve_caves(blocks[pad:pad + (x1 - x0)], heights[pad:pad + (x1 - x0)], x0)
+        self.generate_ores(blocks, heights, x0 - pad)
+        self.generate_dungeons(blocks, heights, x0 - pad)
+        self.generate_trees(blocks, heights, x0 - pad)
+        return blocks[pad:pad + (x1 - x0)]
+    
+    def column_heights(self, x0, x1):
+        """一次性计算 [x0, x1) 所有列的地表高度"""
+        base_height = self.height * 0.6  # 基准高度在60%处
+        # 使用柏林噪声生成高度值
+        noise_vals = perlin_noise1((np.arange(x0, x1) + self.noise_offset) / TERRAIN_SCALE,
+                                   octaves=TERRAIN_OCTAVES,
+                                   persistence=TERRAIN_PERSISTENCE,
+                                   lacunarity=TERRAIN_LACUNARITY,
+                                   base=self.noise_base)
+        # 将噪声值转换为实际高度（astype 与 int() 一样向零取整）
+        return (base_height + noise_vals.astype(np.float64) * 10).astype(np.int64)
+    
+    def generate_columns(self, x0, x1):
+        """用数组运算生成 [x0, x1) 的地层，返回 (方块ID数组, 地表高度)"""
+        heights = self.column_heights(x0, x1)
         
-        # 地面碰撞
-        if 0 <= block_x < world.width and 0 <= block_y < world.height:
-            if world.blocks[block_x][block_y] is not None:
-                self.y = block_y * TILE_SIZE - self.size
-                self.velocity_y = 0
-                self.velocity_x *= 0.8  # 摩擦力
+        # 原石 / 泥土 / 草地分层，最底层3格为基岩：按离地表的深度查表
+        depth = np.arange(self.height, dtype=np.int16)[None, :] - heights.astype(np.int16)[:, None]
+        np.clip(depth, -1, 6, out=depth)
+        depth += 1
+        blocks = STRATA_LOOKUP[depth]
+        blocks[:, self.height - 3:] = BLOCK_IDS["bedrock"]
         
-        # 浮动动画
-        self.bobbing += self.bobbing_speed
+        # 随机把地表换成沙子
+        sand_rolls = seeded_random(self.seed, RNG_STREAM_SAND, np.arange(x0, x1))
+        sand = np.flatnonzero((heights >= 0) & (heights < self.height) & (sand_rolls < 0.1))
+        blocks[sand, heights[sand]] = BLOCK_IDS["sand"]
+        return blocks, heights
+    
+    def carve_caves(self, blocks, heights, x0):
+        """用二维噪声挖洞穴：只挖地表 CAVE_MIN_DEPTH 格以下、基岩以上（这时那里只有泥土和原石），靠近底部的洞灌满岩浆"""
+        top = max(int(heights.min()) + CAVE_MIN_DEPTH, 0)
+        bottom = self.height - 3
+        if top >= bottom:
+            return
+        x1 = x0 + len(blocks)
+        noise = gradient_noise2(self.seed, RNG_STREAM_CAVE, x0, x1, top, bottom, CAVE_SCALES[0])
+        for i in range(1, len(CAVE_SCALES)):
+            noise += gradient_noise2(self.seed, RNG_STREAM_CAVE + i, x0, x1, top, bottom, CAVE_SCALES[i]) * CAVE_WEIGHTS[i]
+        ys = np.arange(top, bottom)
+        band = blocks[:, top:bottom]
+        cave = (np.abs(noise) < CAVE_TUNNEL_WIDTH) | (noise > CAVE_CAVERN_LEVEL)
+        cave &= ys[None, :] >= heights[:, None] + CAVE_MIN_DEPTH
+        fill = np.where(ys >= self.height - CAVE_LAVA_DEPTH, BLOCK_IDS["lava"], AIR).astype(BLOCK_ID_DTYPE)
+        np.copyto(band, fill, where=cave)
+    
+    def generate_ores(self, blocks, heights, x0):
+        """每列对每种矿各掷一次：命中就在该矿的深度范围里随机取一行，贴上一小团矿（只替换对应的母岩）"""
+        xs = np.arange(x0, x0 + len(blocks))
+        # 随机数按 (列, 矿种) 编号一次取完，只给命中的矿脉再取深度和形状
+        keys = xs[:, None] * len(ORE_VEINS) + np.arange(len(ORE_VEINS))
+        low = heights[:, None] + ORE_MIN_DEPTHS
+        high = self.height - 4
+        columns, ores = np.nonzero((seeded_random(self.seed, RNG_STREAM_ORE, keys) < ORE_CHANCES) & (low < high))
+        if len(columns) == 0:
+            return
+        low = low[columns, ores]
+        rolls = seeded_random(self.seed, RNG_STREAM_ORE_SHAPE, keys[columns, ores, None] * 2 + np.arange(2))
+        ys = low + (rolls[:, 0] * (high - low)).astype(np.int64)
+        shapes = VEIN_SHAPES[(rolls[:, 1] * len(VEIN_SHAPES)).astype(np.int64)]
         
-    def draw(self, screen, camera, block_images):
-        # 计算屏幕位置
-        screen_x = self.x - camera.scroll_x
-        screen_y = self.y - camera.scroll_y + math.sin(self.bobbing) * 3  # 添加上下浮动
+        vein_x = (columns[:, None] + shapes[:, :, 0]).reshape(-1)
+        vein_y = (ys[:, None] + shapes[:, :, 1]).reshape(-1)
+        vein_ore = np.repeat(ores, VEIN_SHAPES.shape[1])
+        inside = (vein_x >= 0) & (vein_x < len(blocks)) & (vein_y >= 0) & (vein_y < self.height)
+        vein_x, vein_y, vein_ore = vein_x[inside], vein_y[inside], vein_ore[inside]
+        replace = blocks[vein_x, vein_y] == ORE_HOSTS[vein_ore]
+        # 矿脉重叠时固定让靠后的矿脉（列坐标大、矿种靠后）生效，结果与生成范围无关
+        vein_x, vein_y, vein_ore = vein_x[replace], vein_y[replace], vein_ore[replace]
+        cells = vein_x * self.height + vein_y
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        blocks[vein_x[last], vein_y[last]] = ORE_IDS[vein_ore[last]]
+    
+    def generate_dungeons(self, blocks, heights, x0):
+        xs = np.arange(x0, x0 + len(blocks))
+        columns = np.flatnonzero(seeded_random(self.seed, RNG_STREAM_DUNGEON, xs) < DUNGEON_CHANCE)
+        depths = seeded_randint(self.seed, RNG_STREAM_DUNGEON_DEPTH, xs[columns], DUNGEON_MIN_DEPTH,
+                                DUNGEON_MIN_DEPTH + 15)
+        mask = np.ones(DUNGEON_TEMPLATE.shape, dtype=bool)
+        for x, y in zip(columns.tolist(), (heights[columns] + depths).tolist()):
+            if y + DUNGEON_TEMPLATE.shape[1] <= self.height - 3:
+                stamp(blocks, x, y, DUNGEON_TEMPLATE, mask)
+    
+    def generate_trees(self, blocks, heights, x0):
+        xs = np.arange(x0, x0 + len(blocks))
+        # 5%的概率生成树，并确保有足够的空间生成树
+        is_tree = (seeded_random(self.seed, RNG_STREAM_TREE, xs) < 0.05) & (heights > 5)
+        columns = np.flatnonzero(is_tree)
+        tree_heights = seeded_randint(self.seed, RNG_STREAM_TREE_HEIGHT, xs[columns], 4, 6)
+        leaf_radii = seeded_randint(self.seed, RNG_STREAM_LEAF_RADIUS, xs[columns], 3, 4)  # 树叶半径
+        leaf_heights = seeded_randint(self.seed, RNG_STREAM_LEAF_HEIGHT, xs[columns], 3, 4)  # 树叶高度
+        birch = seeded_random(self.seed, RNG_STREAM_BIRCH, xs[columns]) < BIRCH_CHANCE
+        trees = list(zip(columns.tolist(), heights[columns].tolist(), tree_heights.tolist(),
+                         leaf_radii.tolist(), leaf_heights.tolist(), birch.tolist()))
         
-        if self.item_type in block_images:
-            # 缩放物品图像
-            scaled_item = pygame.transform.scale(block_images[self.item_type], 
-                                              (self.size, self.size))
-            screen.blit(scaled_item, (screen_x, screen_y))
+        # 先铺树叶（只填空气）再立树干，树干总会盖住树叶，
+        # 这样结果与树的生成先后无关，相邻区块各自生成也能拼得上
+        for x, surface_height, tree_height, leaf_radius, leaf_height, is_birch in trees:
+            leaves, _ = TREE_TEMPLATES[(tree_height, leaf_radius, leaf_height)]
+            stamp(blocks, x - leaf_radius, surface_height - tree_height - leaf_height,
+                  BLOCK_IDS["birch_leaves" if is_birch else "leaves"], leaves, AIR_LOOKUP)
+        for x, surface_height, tree_height, leaf_radius, leaf_height, _ in trees:
+            _, trunk = TREE_TEMPLATES[(tree_height, leaf_radius, leaf_height)]
+            stamp(blocks, x - leaf_radius, surface_height - tree_height - leaf_height, BLOCK_IDS["wood"], trunk)
 
 class World:
-    def __init__(self, width, height):
-        self.width = width
+    def __init__(self, height=WORLD_HEIGHT, seed=None, save_dir=None, save_mode="full"):
         self.height = height
-        self.blocks = [[None for _ in range(height)] for _ in range(width)]
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        # 世界种子：同一种子总是生成同样的地形。存档、录像和网络消息里都按 64 位无符号数存，
+        # 负数或更大的种子按 2^64 取模，地形生成本来就只用到低 64 位，生成的世界不变
+        seed &= _MASK64
+        self.seed = seed
+        self.generator = TerrainGenerator(seed, height)
+        self.chunks = {}  # 已加载的区块 cx -> Chunk
+        # 存档目录：被玩家修改过的区块存在其中的区域文件里，卸载后再次靠近时读回
+        # 没有指定存档时用临时目录，只在本次运行中充当区块交换区
+        if save_dir is None:
+            self._save_tmp = tempfile.TemporaryDirectory(prefix="mc2d_world_")
+            save_dir = self._save_tmp.name
+        self.save_dir = save_dir
+        self.save_mode = save_mode
+        base = self.generator.generate_chunk if save_mode == "delta" else None
+        self.regions = RegionStore(os.path.join(save_dir, "region"), base)
+        self.autosaver = Autosaver(self.regions, os.path.join(save_dir, "level.dat"))
+        self.dirty_chunks = set()  # 改动日志：上次存档之后被修改过的区块
+        self.last_autosave = time.monotonic()
         self.block_damage = {}  # 存储方块的当前损坏程度
-        self.dropped_items = []
+        self.random = random.Random(seed)  # 模拟里用到的随机数（掉落物的初始速度），按种子播种，同样的输入总是得到同样的过程
+        self.dropped_items = ItemStore(rng=self.random)
+        self.blocks = BlockNameView(self)  # 按名称访问的兼容视图
         self.last_damaged_block = None  # 记录最后一次挖掘的方块
-        self.current_mining_pos = None  # 添加当前正在挖掘的位置
-        self.generate_terrain()
-    
-    def generate_terrain(self):
-        # 地形生成参数
-        octaves = 6
-        persistence = 0.5
-        lacunarity = 2.0
-        scale = 50.0
-        base_height = self.height * 0.6  # 基准高度在60%处
+        self.mining = {}  # 挖掘者 -> 正在挖的方块；单人模式的挖掘者是 None，多人模式是玩家编号
+        self.block_listeners = []  # 方块变化时回调 listener(x, y)
+        self.active_tiles = {}  # 醒着的方块实体，只用键，按加入顺序 tick
+        self.tick = 0  # 已经模拟的步数
+        self.block_updates = {}  # 方块更新队列：到期的步数 -> 要检查的坐标（只用键）
+        self.active_fluids = {kind: {} for kind in range(1, len(FLUID_TYPES) + 1)}  # 下次流动要推进的流体格
+        self.light_updates = {}  # 透光或发光变化、等着重算光照的格子（只用键）
+        self.light_listeners = []  # 光照变化时回调 listener(x0, y0, x1, y1)，范围不含右下边界
+        self.area_listeners = []  # 成片的方块变化（爆炸）不逐格回调 block_listeners，而是回调 listener(x0, y0, x1, y1)
+        self.primed_tnt = {}  # 点燃的 TNT (x, y) -> 爆炸的步数
+        self.add_block_listener(self.dropped_items.wake_near)
+        self.add_block_listener(self.schedule_neighbors)
+        self.add_area_listener(self.dropped_items.wake_rect)
+        self.add_area_listener(self.schedule_area)
+
+    def is_chunk_loaded(self, cx):
+        return cx in self.chunks
+    
+    def chunks_loaded_at(self, cxs):
+        """向量化版 is_chunk_loaded"""
+        return np.isin(cxs, list(self.chunks))
+    
+    def get_chunk(self, cx):
+        """返回区块，未加载时从磁盘缓存读回或即时生成"""
+        chunk = self.chunks.get(cx)
+        if chunk is None:
+            chunk = self.load_chunk(cx)
+            if chunk is None:
+                chunk = self.generate_chunk(cx)
+            self.chunks[cx] = chunk
+            self.light_chunks(cx, cx + 1)
+        return chunk
+    
+    def ensure_chunks(self, cx0, cx1):
+        """确保 [cx0, cx1) 的区块都已加载，需要新生成的连续区块合并成一次批量生成"""
+        added = [cx for cx in range(cx0, cx1) if cx not in self.chunks]
+        missing = []
+        for cx in added:
+            # delta 存档的区块要在种子地形上打补丁，和其它缺失区块一起批量生成
+            chunk = self.load_chunk(cx) if self.save_mode == "full" else None
+            if chunk is not None:
+                self.chunks[cx] = chunk
+            else:
+                missing.append(cx)
         
-        # 生成地形高度
-        heights = []
-        for x in range(self.width):
-            # 使用柏林噪声生成高度值
-            noise_val = pnoise1(x/scale, 
-                              octaves=octaves, 
-                              persistence=persistence, 
-                              lacunarity=lacunarity)
-            # 将噪声值转换为实际高度
-            height = int(base_height + noise_val * 10)
-            heights.append(height)
-        
-        # 根据高度生成地形
-        for x in range(self.width):
-            surface_height = heights[x]
-            
-            # 生成地表
-            for y in range(self.height):
-                if y >= self.height - 3:  # 最底层3格生成基岩
-                    self.blocks[x][y] = "bedrock"
-                elif y > surface_height + 5:  # 泥土层下方生成原石
-                    self.blocks[x][y] = "rock"  # 这里生成的是原石，破坏后掉落石头
-                elif y > surface_height:
-                    self.blocks[x][y] = "dirt"
-                elif y == surface_height:
-                    self.blocks[x][y] = "grass"
-                
-                # 随机生成沙子
-                if y == surface_height and random.random() < 0.1:
-                    self.blocks[x][y] = "sand"
+        # 把缺失的区块按连续区间分组
+        for run_start, run_end in contiguous_runs(missing):
+            for chunk in self.generate_chunks(run_start, run_end):
+                if self.save_mode == "delta":
+                    chunk = self.load_chunk(chunk.cx, chunk.blocks) or chunk
+                self.chunks[chunk.cx] = chunk
         
-        # 生成树
-        self.generate_trees(heights)
+        for run_start, run_end in contiguous_runs(added):
+            self.light_chunks(run_start, run_end)
     
-    def generate_trees(self, heights):
-        for x in range(self.width):
-            if random.random() < 0.05:  # 5%的概率生成树
-                surface_height = heights[x]
-                
-                # 确保有足够的空间生成树
-                if x < self.width - 2 and surface_height > 5:
-                    # 生成树干
-                    tree_height = random.randint(4, 6)
-                    for y in range(surface_height - 1, surface_height - tree_height - 1, -1):
-                        self.blocks[x][y] = "wood"
-                    
-                    # 生成树叶
-                    leaf_radius = random.randint(3, 4)  # 树叶半径
-                    leaf_height = random.randint(3, 4)  # 树叶高度
-                    
-                    # 树叶生成中心点
-                    center_y = surface_height - tree_height
-                    
-                    # 生成树叶
-                    for leaf_x in range(x - leaf_radius, x + leaf_radius + 1):
-                        for leaf_y in range(center_y - leaf_height, center_y + 1):
-                            if (0 <= leaf_x < self.width and 
-                                0 <= leaf_y < self.height and 
-                                self.blocks[leaf_x][leaf_y] is None):
-                                # 计算到中心的距离
-                                dx = leaf_x - x
-                                dy = leaf_y - center_y
-                                distance = math.sqrt(dx * dx + dy * dy)
-                                
-                                # 只要在半径范围内就生成树叶
-                                if distance <= leaf_radius:
-                                    self.blocks[leaf_x][leaf_y] = "leaves"
+    def has_saved_chunk(self, cx):
+        return self.autosaver.pending_chunk(cx) is not None or self.regions.has_chunk(cx)
+    
+    def load_chunk(self, cx, base=None):
+        # 还在排队写入的快照比区域文件里的新
+        snapshot = self.autosaver.pending_chunk(cx)
+        if snapshot is not None:
+            blocks, tile_entities = snapshot[0], decode_tile_entities(snapshot[1], 0, cx * CHUNK_SIZE)
+        else:
+            saved = self.regions.read_chunk(cx, base)
+            if saved is None:
+                return None
+            blocks, tile_entities = saved
+        chunk = Chunk(cx, self.height)
+        chunk.blocks[:] = blocks
+        chunk.modified = True
+        chunk.tile_entities = tile_entities
+        for entity in tile_entities.values():
+            self.schedule_tile(entity)
+        return chunk
+    
+    def evict_chunk(self, cx):
+        chunk = self.chunks.pop(cx)
+        for entity in chunk.tile_entities.values():
+            self.active_tiles.pop(entity, None)  # 卸载区块里的方块实体暂停，读回时再按状态唤醒
+        # 未修改的区块可以由种子重新生成，直接丢弃；有新改动的交给存档线程写回磁盘
+        if cx in self.dirty_chunks:
+            self.dirty_chunks.discard(cx)
+            self.autosaver.submit({cx: (chunk.blocks, encode_tile_entities(chunk.tile_entities))})
+    
+    def snapshot(self, player=None):
+        """拷贝日志里的脏区块（和玩家状态）交给存档线程，只花拷贝几 KB 内存的时间"""
+        chunks = {cx: (self.chunks[cx].blocks.copy(), encode_tile_entities(self.chunks[cx].tile_entities))
+                  for cx in self.dirty_chunks}
+        self.dirty_chunks.clear()
+        self.autosaver.submit(chunks, self.encode_level(player) if player is not None else None)
+        self.last_autosave = time.monotonic()
+    
+    def autosave(self, player, interval=AUTOSAVE_INTERVAL):
+        """每隔 interval 秒在后台保存一次"""
+        if time.monotonic() - self.last_autosave >= interval:
+            self.snapshot(player)
+    
+    def save(self, player):
+        """同步存档：提交快照并等后台写完"""
+        self.snapshot(player)
+        self.autosaver.wait()
+    
+    def close(self):
+        self.autosaver.close()
+        self.regions.close()
+    
+    def encode_level(self, player):
+        """把种子、玩家和掉落物编码成 level.dat 的内容"""
+        out = io.BytesIO()
+        out.write(struct.pack("<4sHQHB", LEVEL_MAGIC, SAVE_VERSION, self.seed, self.height,
+                              SAVE_MODES.index(self.save_mode)))
+        # 玩家：位置、速度、选中格、物品栏
+        out.write(struct.pack("<dddHH", player.x, player.y, player.velocity_y,
+                              player.selected_block, len(player.inventory)))
+        for item_type, count in player.inventory.items():
+            _write_str(out, item_type)
+            out.write(struct.pack("<I", count))
+        # 掉落物：各个属性数组依次整段写入
+        items = self.dropped_items
+        n = items.size
+        item_types = [BLOCK_NAMES[block_id] for block_id in np.unique(items.item_type[:n])]
+        out.write(struct.pack("<IB", n, len(item_types)))
+        for item_type in item_types:
+            _write_str(out, item_type)
+        type_index = np.searchsorted([BLOCK_IDS[item_type] for item_type in item_types], items.item_type[:n])
+        for array in (items.x, items.y, items.velocity_x, items.velocity_y, items.bobbing):
+            out.write(array[:n].astype("<f8").tobytes())
+        out.write(type_index.astype(np.uint8).tobytes())
+        out.write(items.count[:n].astype("<i8").tobytes())
+        out.write(items.asleep[:n].astype(np.uint8).tobytes())
+        return out.getvalue()
+    
+    @classmethod
+    def load(cls, save_dir):
+        """读取存档，返回 (world, player)。区块不在这里读，之后靠近时才从区域文件按需读取"""
+        with open(os.path.join(save_dir, "level.dat"), "rb") as f:
+            data = memoryview(f.read())
+        magic, version, seed, height, save_mode = struct.unpack_from("<4sHQHB", data, 0)
+        if magic != LEVEL_MAGIC or version not in (2, SAVE_VERSION):
+            raise ValueError(f"unsupported save: {save_dir}")
+        # 版本 2 的 full 存档存的是整个区块，照常读；delta 存档记的是相对旧地形的差异，
+        # 套到新地形上会错位，旧的生成器已经没有了，没法迁移
+        if version < SAVE_VERSION and SAVE_MODES[save_mode] == "delta":
+            raise ValueError(f"delta save from an older terrain generator: {save_dir}")
+        offset = struct.calcsize("<4sHQHB")
+        world = cls(height, seed, save_dir, SAVE_MODES[save_mode])
+        
+        x, y, velocity_y, selected_block, inventory_size = struct.unpack_from("<dddHH", data, offset)
+        offset += struct.calcsize("<dddHH")
+        player = Player(x, y)
+        player.velocity_y = velocity_y
+        player.selected_block = selected_block
+        for _ in range(inventory_size):
+            item_type, offset = _read_str(data, offset)
+            count, = struct.unpack_from("<I", data, offset)
+            offset += 4
+            if item_type in player.inventory:
+                player.inventory[item_type] = count
+        
+        n, type_count = struct.unpack_from("<IB", data, offset)
+        offset += 5
+        item_types = []
+        for _ in range(type_count):
+            item_type, offset = _read_str(data, offset)
+            item_types.append(BLOCK_IDS[item_type])
+        items = world.dropped_items
+        while len(items.x) < n:
+            items._grow()
+        for array in (items.x, items.y, items.velocity_x, items.velocity_y, items.bobbing):
+            array[:n] = np.frombuffer(data, dtype="<f8", count=n, offset=offset)
+            offset += 8 * n
+        items.item_type[:n] = np.array(item_types, dtype=BLOCK_ID_DTYPE)[
+            np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)] if n else 0
+        offset += n
+        items.count[:n] = np.frombuffer(data, dtype="<i8", count=n, offset=offset)
+        offset += 8 * n
+        items.asleep[:n] = np.frombuffer(data, dtype=np.uint8, count=n, offset=offset).astype(bool)
+        items.size = n
+        return world, player
+    
+    def update_chunks(self, *cameras):
+        """加载各个视野附近的区块，卸载离所有视野都远的区块"""
+        keep = set()
+        for camera in cameras:
+            left, right = view_chunk_range(camera)
+            self.ensure_chunks(left - CHUNK_LOAD_MARGIN, right + CHUNK_LOAD_MARGIN + 1)
+            keep.update(range(left - CHUNK_EVICT_MARGIN, right + CHUNK_EVICT_MARGIN + 1))
+        for cx in [cx for cx in self.chunks if cx not in keep]:
+            self.evict_chunk(cx)
+
+    def in_bounds(self, x, y):
+        return 0 <= y < self.height
+
+    def get_block_id(self, x, y):
+        if self.in_bounds(x, y):
+            return int(self.get_chunk(x // CHUNK_SIZE).blocks[x % CHUNK_SIZE, y])
+        return AIR
+
+    def get_block(self, x, y):
+        """返回方块名称，空气或越界返回 None"""
+        return BLOCK_NAMES[self.get_block_id(x, y)]
+
+    def set_block(self, x, y, block_type):
+        if self.in_bounds(x, y):
+            chunk = self.get_chunk(x // CHUNK_SIZE)
+            block_id = BLOCK_IDS[block_type] if block_type is not None else AIR
+            old_id = chunk.blocks[x % CHUNK_SIZE, y]
+            kind = TILE_ENTITY_KINDS[block_id]
+            if TILE_ENTITY_KINDS[old_id] != kind:
+                self.replace_tile_entity(chunk, x, y, kind)
+            if (LIGHT_OPACITY_LOOKUP[old_id] != LIGHT_OPACITY_LOOKUP[block_id] or
+                    LIGHT_EMISSION_LOOKUP[old_id] != LIGHT_EMISSION_LOOKUP[block_id]):
+                self.light_updates[(x, y)] = None
+            chunk.blocks[x % CHUNK_SIZE, y] = block_id
+            chunk.modified = True
+            self.dirty_chunks.add(chunk.cx)
+            for listener in self.block_listeners:
+                listener(x, y)
+    
+    def add_block_listener(self, listener):
+        self.block_listeners.append(listener)
+    
+    def add_light_listener(self, listener):
+        self.light_listeners.append(listener)
+    
+    def add_area_listener(self, listener):
+        self.area_listeners.append(listener)
+    
+    def clear_blocks(self, xs, ys):
+        """一次性把一批坐标变成空气：按区块整批写入，变化范围作为一个矩形通知 area_listeners"""
+        if len(xs) == 0:
+            return
+        cxs = xs // CHUNK_SIZE
+        for cx in np.unique(cxs).tolist():
+            selected = cxs == cx
+            chunk = self.get_chunk(cx)
+            local_x, chunk_ys = xs[selected] - cx * CHUNK_SIZE, ys[selected]
+            old = chunk.blocks[local_x, chunk_ys]
+            # 方块实体和影响光照的方块很少，逐个处理
+            for i in np.flatnonzero(TILE_ENTITY_LOOKUP[old]):
+                self.replace_tile_entity(chunk, chunk.x0 + int(local_x[i]), int(chunk_ys[i]), None)
+            for i in np.flatnonzero((LIGHT_OPACITY_LOOKUP[old] != 0) | (LIGHT_EMISSION_LOOKUP[old] != 0)):
+                self.light_updates[(chunk.x0 + int(local_x[i]), int(chunk_ys[i]))] = None
+            chunk.blocks[local_x, chunk_ys] = AIR
+            chunk.modified = True
+            self.dirty_chunks.add(cx)
+        rect = (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+        for listener in self.area_listeners:
+            listener(*rect)
+    
+    def light_chunks(self, cx0, cx1):
+        """新加载的区块 [cx0, cx1) 算光照，光能照进去的相邻区块边缘也一起重算"""
+        self.relight(cx0 * CHUNK_SIZE - MAX_LIGHT, cx1 * CHUNK_SIZE + MAX_LIGHT)
+    
+    def update_lighting(self):
+        """把这一步里透光或发光变化的格子周围的光照重算一遍。
+        
+        光最远照 MAX_LIGHT 格，所以只有变化列左右 MAX_LIGHT 列以内的光照可能改变，
+        相邻区块里的变化合成一次计算，不会重算整个世界。
+        """
+        if not self.light_updates:
+            return
+        xs = sorted({x for x, _ in self.light_updates})
+        top = min(y for _, y in self.light_updates)
+        self.light_updates.clear()
+        cxs = sorted({x // CHUNK_SIZE for x in xs})
+        for run_start, run_end in contiguous_runs(cxs):
+            group = [x for x in xs if run_start <= x // CHUNK_SIZE < run_end]
+            self.relight(group[0] - MAX_LIGHT, group[-1] + MAX_LIGHT + 1, max(top - MAX_LIGHT, 0))
+    
+    def relight(self, x0, x1, y0=0):
+        """重算 [x0, x1) 列、y0 行以下已加载部分的光照，变化的范围通知 light_listeners"""
+        cxs = [cx for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1) if cx in self.chunks]
+        for run_start, run_end in contiguous_runs(cxs):
+            self.relight_span(max(x0, run_start * CHUNK_SIZE), min(x1, run_end * CHUNK_SIZE), y0)
+    
+    def relight_span(self, x0, x1, y0):
+        # 读取范围比重算范围外扩一列（上面再多一行）作为固定边界：边界上的光照不受这次改动影响，
+        # 只会照进来。y0 以上的光照不会变，但直射阳光要看整列
+        blocks = self.loaded_columns(x0, x1, "blocks")
+        shaded = np.logical_or.accumulate(LIGHT_OPACITY_LOOKUP[blocks] > 0, axis=1)
+        top = max(y0 - 1, 0)
+        light = np.zeros((2, x1 - x0 + 2, self.height - top), dtype=np.int16)
+        light[:, 0] = self.loaded_columns(x0 - 1, x0, "light")[:, 0, top:]
+        light[:, -1] = self.loaded_columns(x1, x1 + 1, "light")[:, 0, top:]
+        # 每列第一个挡光的方块本身还照得到阳光，它下面的才被遮住
+        light[0, 1:-1, 1:] = np.where(shaded[:, top:-1], 0, MAX_LIGHT)
+        light[0, 1:-1, 0] = np.where(shaded[:, top - 1], 0, MAX_LIGHT) if top > 0 else MAX_LIGHT
+        light[1, 1:-1] = LIGHT_EMISSION_LOOKUP[blocks[:, top:]]
+        if top < y0:
+            light[:, 1:-1, 0] = self.loaded_columns(x0, x1, "light")[:, :, top]
+        decay = np.full(light.shape[1:], MAX_LIGHT + 1, dtype=np.int16)
+        decay[1:-1, y0 - top:] = LIGHT_DECAY_LOOKUP[blocks[:, y0:]]
+        light = propagate_light(light, decay)[:, 1:-1, y0 - top:]
+        
+        # 写回各个区块，记下真正变化的范围
+        changed = np.zeros(x1 - x0, dtype=bool)
+        changed_rows = np.zeros(self.height - y0, dtype=bool)
+        x = x0
+        while x < x1:
+            cx = x // CHUNK_SIZE
+            local = x - cx * CHUNK_SIZE
+            span = min(CHUNK_SIZE - local, x1 - x)
+            new = light[:, x - x0:x - x0 + span]
+            old = self.chunks[cx].light[:, local:local + span, y0:]
+            diff = (old != new).any(axis=0)
+            if diff.any():
+                old[:] = new
+                changed[x - x0:x - x0 + span] = diff.any(axis=1)
+                changed_rows |= diff.any(axis=0)
+            x += span
+        if changed.any():
+            columns, rows = np.flatnonzero(changed), np.flatnonzero(changed_rows)
+            for listener in self.light_listeners:
+                listener(x0 + int(columns[0]), y0 + int(rows[0]), x0 + int(columns[-1]) + 1, y0 + int(rows[-1]) + 1)
+    
+    def loaded_columns(self, x0, x1, name):
+        """把 [x0, x1) 列的区块数组 name（blocks 或 light）拼起来，未加载的列是 0"""
+        shape = (2, x1 - x0, self.height) if name == "light" else (x1 - x0, self.height)
+        columns = np.zeros(shape, dtype=np.uint8)
+        x = x0
+        while x < x1:
+            cx = x // CHUNK_SIZE
+            local = x - cx * CHUNK_SIZE
+            span = min(CHUNK_SIZE - local, x1 - x)
+            chunk = self.chunks.get(cx)
+            if chunk is not None:
+                columns[..., x - x0:x - x0 + span, :] = getattr(chunk, name)[..., local:local + span, :]
+            x += span
+        return columns
+    
+    def get_light_region(self, x0, y0, x1, y1):
+        """矩形 [x0, x1) x [y0, y1) 的显示亮度（天空光和方块光取大），纵向越界部分是满光照"""
+        light = np.full((max(0, x1 - x0), max(0, y1 - y0)), MAX_LIGHT, dtype=np.uint8)
+        cy0, cy1 = max(y0, 0), min(y1, self.height)
+        if cy0 < cy1 and x0 < x1:
+            for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+                self.get_chunk(cx)
+            light[:, cy0 - y0:cy1 - y0] = self.loaded_columns(x0, x1, "light")[:, :, cy0:cy1].max(axis=0)
+        return light
+    
+    def tile_entity_at(self, x, y):
+        if self.in_bounds(x, y):
+            return self.get_chunk(x // CHUNK_SIZE).tile_entities.get((x % CHUNK_SIZE, y))
+        return None
+    
+    def replace_tile_entity(self, chunk, x, y, kind):
+        """方块换成另一种方块实体（或普通方块）时丢掉旧的状态，按需建一个新的"""
+        old = chunk.tile_entities.pop((x % CHUNK_SIZE, y), None)
+        if old is not None:
+            self.active_tiles.pop(old, None)
+        if kind is not None:
+            chunk.tile_entities[(x % CHUNK_SIZE, y)] = TILE_ENTITY_CLASSES[kind](x, y)
+    
+    def schedule_tile(self, entity):
+        """有事可做的方块实体加入调度"""
+        if entity.active():
+            self.active_tiles[entity] = None
+    
+    def tile_changed(self, entity):
+        """方块实体的状态被外部改动（玩家放进、取出物品）后记入改动日志并按需唤醒"""
+        chunk = self.get_chunk(entity.x // CHUNK_SIZE)
+        chunk.modified = True
+        self.dirty_chunks.add(chunk.cx)
+        self.schedule_tile(entity)
+    
+    def tick_tile_entities(self):
+        """只推进醒着的方块实体，闲置的箱子、熔炉再多也不花时间"""
+        if not self.active_tiles:
+            return
+        for entity in list(self.active_tiles):
+            if not entity.tick(self):
+                del self.active_tiles[entity]
+            self.dirty_chunks.add(entity.x // CHUNK_SIZE)
+
+    def is_solid(self, x, y):
+        return self.collides(x, y, SOLID_LOOKUP)
+    
+    def collides(self, x, y, lookup):
+        """方块 (x, y) 在碰撞表 lookup 中是否挡路，纵向越界不挡"""
+        if self.in_bounds(x, y):
+            return lookup[self.get_chunk(x // CHUNK_SIZE).blocks[x % CHUNK_SIZE, y]]
+        return False
+
+    def block_ids_at(self, xs, ys):
+        """向量化查询一批坐标的方块ID，未加载的区块和纵向越界都当作空气"""
+        ids = np.zeros(len(xs), dtype=BLOCK_ID_DTYPE)
+        valid = (ys >= 0) & (ys < self.height)
+        cxs = xs // CHUNK_SIZE
+        if not valid.any():
+            return ids
+        cx0, cx1 = int(cxs[valid].min()), int(cxs[valid].max()) + 1
+        if cx1 - cx0 <= BLOCK_LOOKUP_MAX_CHUNKS:
+            # 范围不大时把这些区块拼成一张表，一次花式索引查完（未加载的区块是全空气）
+            table = np.zeros((cx1 - cx0, CHUNK_SIZE, self.height), dtype=BLOCK_ID_DTYPE)
+            for cx in range(cx0, cx1):
+                chunk = self.chunks.get(cx)
+                if chunk is not None:
+                    table[cx - cx0] = chunk.blocks
+            ids[valid] = table[cxs[valid] - cx0, xs[valid] % CHUNK_SIZE, ys[valid]]
+            return ids
+        for cx in np.unique(cxs[valid]).tolist():
+            chunk = self.chunks.get(cx)
+            if chunk is not None:
+                selected = valid & (cxs == cx)
+                ids[selected] = chunk.blocks[xs[selected] - cx * CHUNK_SIZE, ys[selected]]
+        return ids
+    
+    def get_region(self, x0, y0, x1, y1):
+        """拼出矩形 [x0, x1) x [y0, y1) 的方块ID数组，跨区块读取，纵向越界部分为空气"""
+        region = np.zeros((max(0, x1 - x0), max(0, y1 - y0)), dtype=BLOCK_ID_DTYPE)
+        cy0, cy1 = max(y0, 0), min(y1, self.height)
+        if cy0 >= cy1:
+            return region
+        x = x0
+        while x < x1:
+            cx = x // CHUNK_SIZE
+            local = x - cx * CHUNK_SIZE
+            span = min(CHUNK_SIZE - local, x1 - x)
+            region[x - x0:x - x0 + span, cy0 - y0:cy1 - y0] = \
+                self.get_chunk(cx).blocks[local:local + span, cy0:cy1]
+            x += span
+        return region
+
+    def solid_mask(self, x0, y0, x1, y1):
+        """返回矩形 [x0, x1) x [y0, y1) 内的实心方块布尔数组，越界部分视为空气"""
+        return SOLID_LOOKUP[self.get_region(x0, y0, x1, y1)]
+
+    def solid_tiles_in_rect(self, x0, y0, x1, y1):
+        """返回矩形内所有实心方块的世界坐标，形状为 (n, 2)"""
+        return np.argwhere(self.solid_mask(x0, y0, x1, y1)) + (x0, y0)
+
+    def generate_chunk(self, cx):
+        return self.generate_chunks(cx, cx + 1)[0]
+    
+    def generate_chunks(self, cx0, cx1):
+        """批量生成 [cx0, cx1) 的连续区块：整段地形一次算完再切成区块"""
+        return self.make_chunks(cx0, self.generator.generate_chunks(cx0, cx1))
+    
+    def make_chunks(self, cx0, blocks):
+        chunks = []
+        for i in range(len(blocks) // CHUNK_SIZE):
+            chunk = Chunk(cx0 + i, self.height)
+            chunk.blocks[:] = blocks[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
+            chunks.append(chunk)
+        return chunks
+    
+    def generate_terrain(self, x0, x1):
+        """生成 [x0, x1) 列的完整地形（地层 + 树），返回方块ID数组"""
+        return self.generator.generate_terrain(x0, x1)
+    
+    def pregenerate(self, cx0, cx1, workers=None):
+        """用进程池并行预生成 [cx0, cx1) 中尚未加载的区块。
+        
+        每个区块只由种子和坐标决定，所以拆给多个进程生成再拼回来，结果和单进程完全相同。
+        """
+        missing = [cx for cx in range(cx0, cx1)
+                   if cx not in self.chunks and not self.has_saved_chunk(cx)]
+        if not missing:
+            return
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(missing) // PREGENERATE_CHUNKS_PER_WORKER))
+        
+        # 按连续区间切分，再把每个区间均分给各个进程
+        runs = []
+        for run_start, run_end in contiguous_runs(missing):
+            step = -(-(run_end - run_start) // workers)
+            runs.extend((a, min(a + step, run_end)) for a in range(run_start, run_end, step))
+        
+        starts = [a for a, _ in runs]
+        ends = [b for _, b in runs]
+        if workers == 1:
+            results = list(map(self.generator.generate_chunks, starts, ends))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.generator.generate_chunks, starts, ends))
+        for cx_start, blocks in zip(starts, results):
+            for chunk in self.make_chunks(cx_start, blocks):
+                self.chunks[chunk.cx] = chunk
+        for run_start, run_end in contiguous_runs(missing):
+            self.light_chunks(run_start, run_end)
+    
+    def schedule_block_update(self, x, y, delay=1):
+        """安排 delay 步之后检查方块 (x, y)"""
+        self.block_updates.setdefault(self.tick + delay, {})[(x, y)] = None
+    
+    def schedule_neighbors(self, x, y):
+        # 方块变化后检查它自己和上下左右：上面的沙子可能要掉，旁边的流体可能要流过来
+        for nx, ny in ((x, y), (x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)):
+            if self.in_bounds(nx, ny):
+                self.schedule_block_update(nx, ny)
+    
+    def schedule_area(self, x0, y0, x1, y1):
+        # 成片变化后检查矩形和外面一圈
+        for x in range(x0 - 1, x1 + 1):
+            for y in range(max(y0 - 1, 0), min(y1 + 1, self.height)):
+                self.schedule_block_update(x, y)
+    
+    def prime_tnt(self, x, y, fuse=TNT_FUSE_TICKS):
+        """点燃 TNT，fuse 步之后爆炸；已经点燃的保留更早的那次"""
+        if (x, y) not in self.primed_tnt:
+            self.primed_tnt[(x, y)] = self.tick + fuse
+            self.schedule_block_update(x, y, fuse)
+    
+    def explode(self, x, y, radius=TNT_RADIUS, power=TNT_POWER):
+        """以 (x, y) 为中心爆炸。
+        
+        半径内的方块用一张数组遮罩一次算完：硬度低于该处爆炸强度的方块（基岩、流体的硬度是无穷大，不会被炸掉）
+        一次性移除，掉落物按种类合并，每种只生成一堆；波及的 TNT 不直接移除而是被点燃，之后接着爆炸。
+        """
+        x0, x1 = x - radius, x + radius + 1
+        y0, y1 = max(y - radius, 0), min(y + radius + 1, self.height)
+        ids = self.get_region(x0, y0, x1, y1)
+        dx = np.arange(x0, x1)[:, None] - x
+        dy = np.arange(y0, y1)[None, :] - y
+        distance = np.sqrt(dx * dx + dy * dy)
+        strength = power * (1 - distance / (radius + 1))
+        blasted = (ids != AIR) & (distance <= radius) & (HARDNESS_LOOKUP[ids] <= strength)
+        
+        # 连锁：被波及的其它 TNT 离得越远引信越长
+        tnt = blasted & (ids == BLOCK_IDS["tnt"])
+        tnt[x - x0, y - y0] = False
+        for local_x, local_y in np.argwhere(tnt):
+            self.prime_tnt(x0 + int(local_x), y0 + int(local_y),
+                           TNT_CHAIN_FUSE_TICKS + int(distance[local_x, local_y]))
+        blasted &= ~tnt
+        
+        local_x, local_y = np.nonzero(blasted)
+        xs, ys = local_x + x0, local_y + y0
+        # 掉落物按种类计数（爆炸的 TNT 自己不掉落），箱子、熔炉里的东西也算进去
+        removed = ids[blasted]
+        counts = np.bincount(DROP_LOOKUP[removed[(xs != x) | (ys != y)]], minlength=len(BLOCK_NAMES))
+        counts[AIR] = 0
+        drops = {BLOCK_NAMES[block_id]: int(counts[block_id]) for block_id in np.flatnonzero(counts)}
+        special = TILE_ENTITY_LOOKUP[removed]
+        for tile_x, tile_y in zip(xs[special].tolist(), ys[special].tolist()):
+            for item_type, count in self.tile_entity_at(tile_x, tile_y).contents():
+                drops[item_type] = drops.get(item_type, 0) + count
+        
+        self.clear_blocks(xs, ys)
+        drop_x = x * TILE_SIZE + TILE_SIZE / 2
+        drop_y = y * TILE_SIZE + TILE_SIZE / 2
+        for item_type, count in drops.items():
+            self.dropped_items.spawn(drop_x, drop_y, item_type, count)
+    
+    def update_blocks(self):
+        """处理这一步到期的方块更新：重力方块下落一格，流体按各自的间隔推进。
+        
+        没有到期的更新、也没有在流动的流体时什么都不做，静止的湖和沙堆不花时间。
+        """
+        self.tick += 1
+        due = self.block_updates.pop(self.tick, None)
+        if due:
+            for x, y in due:
+                if x // CHUNK_SIZE not in self.chunks:
+                    self.primed_tnt.pop((x, y), None)
+                    continue  # 卸载区块里的更新直接丢掉
+                block_id = self.get_block_id(x, y)
+                if self.primed_tnt.get((x, y)) == self.tick:
+                    del self.primed_tnt[(x, y)]
+                    if block_id == BLOCK_IDS["tnt"]:
+                        self.explode(x, y)
+                elif FALLING_LOOKUP[block_id]:
+                    below = self.get_block_id(x, y + 1)
+                    if y + 1 < self.height and (below == AIR or LIQUID_LOOKUP[below]):
+                        # 掉进流体里会把流体挤掉
+                        self.set_block(x, y, None)
+                        self.set_block(x, y + 1, BLOCK_NAMES[block_id])
+                elif FLUID_KIND_LOOKUP[block_id]:
+                    self.active_fluids[FLUID_KIND_LOOKUP[block_id]][(x, y)] = None
+        for kind, cells in self.active_fluids.items():
+            if cells and self.tick % FLUIDS[FLUID_TYPES[kind - 1]]["interval"] == 0:
+                self.step_fluid(kind)
+    
+    def step_fluid(self, kind):
+        """在被唤醒的流体格周围的区域里推进一步元胞自动机，变化的格子会再唤醒下一步"""
+        cells = np.array(list(self.active_fluids[kind]), dtype=np.int64)
+        self.active_fluids[kind].clear()
+        cxs = cells[:, 0] // CHUNK_SIZE
+        # 相邻区块里的流体合成一块区域一起算，离得远的各算各的，不会扫过中间的大片空地
+        for run_start, run_end in contiguous_runs(np.unique(cxs).tolist()):
+            group = cells[(cxs >= run_start) & (cxs < run_end)]
+            # 写入范围是这些格子外扩一圈，读取范围再外扩一圈
+            x0, x1 = int(group[:, 0].min()) - 2, int(group[:, 0].max()) + 3
+            y0, y1 = max(int(group[:, 1].min()) - 2, -1), min(int(group[:, 1].max()) + 3, self.height + 1)
+            xs = np.repeat(np.arange(x0, x1), y1 - y0)
+            ys = np.tile(np.arange(y0, y1), x1 - x0)
+            ids = self.block_ids_at(xs, ys).reshape(x1 - x0, y1 - y0)
+            new = fluid_step(ids, kind)
+            for local_x, local_y in np.argwhere(new != ids[1:-1, 1:-1]):
+                x, y = x0 + 1 + int(local_x), y0 + 1 + int(local_y)
+                if self.in_bounds(x, y) and x // CHUNK_SIZE in self.chunks:
+                    self.set_block(x, y, BLOCK_NAMES[new[local_x, local_y]])
     
     def place_block(self, x, y, block_type, player):
-        if 0 <= x < self.width and 0 <= y < self.height:
+        if self.in_bounds(x, y):
+            # 对着箱子、熔炉右键是往里放东西，而不是放方块
+            entity = self.tile_entity_at(x, y)
+            if entity is not None:
+                if entity.interact(self, player):
+                    self.tile_changed(entity)
+                return
+            # 对着 TNT 右键点燃
+            if self.get_block_id(x, y) == BLOCK_IDS["tnt"]:
+                self.prime_tnt(x, y)
+                return
             # 检查玩家是否有足够的方块
-            if self.blocks[x][y] is None and player.inventory[block_type] > 0:
-                self.blocks[x][y] = block_type
+            if self.get_block_id(x, y) == AIR and player.inventory[block_type] > 0:
+                self.set_block(x, y, block_type)
                 player.inventory[block_type] -= 1
     
-    def damage_block(self, x, y):
-        if 0 <= x < self.width and 0 <= y < self.height:
-            block = self.blocks[x][y]
-            if block is not None:
+    def damage_block(self, x, y, miner=None):
+        if self.in_bounds(x, y):
+            block_id = self.get_block_id(x, y)
+            if block_id != AIR:
                 # 获取方块的硬度
-                hardness = BLOCK_PROPERTIES[block]["hardness"]
+                hardness = HARDNESS_LOOKUP[block_id]
                 
                 # 如果是基岩，直接返回
                 if hardness == float('inf'):
@@ -257,9 +2184,9 @@ class World:
                 block_key = f"{x},{y}"
                 
                 # 如果挖掘位置改变，重置之前的挖掘进度
-                if self.current_mining_pos != block_key:
-                    self.reset_block_damage()
-                    self.current_mining_pos = block_key
+                if self.mining.get(miner) != block_key:
+                    self.reset_block_damage(miner)
+                    self.mining[miner] = block_key
                 
                 # 初始化方块损坏程度
                 if block_key not in self.block_damage:
@@ -272,45 +2199,46 @@ class World:
                 # 如果损坏程度达到硬度，破坏方块
                 if self.block_damage[block_key] >= hardness:
                     self.break_block(x, y)
-                    self.reset_block_damage()
+                    self.reset_block_damage(miner)
+                    self.block_damage.pop(block_key, None)  # 别人挖到一半的进度也作废
     
-    def reset_block_damage(self):
-        """重置所有方块的损坏程度和当前挖掘位置"""
-        self.block_damage.clear()
-        self.current_mining_pos = None
+    def reset_block_damage(self, miner=None):
+        """停止 miner 的挖掘：它正在挖的方块没有别人在挖时，损坏程度清零"""
+        block_key = self.mining.pop(miner, None)
+        if block_key is not None and block_key not in self.mining.values():
+            self.block_damage.pop(block_key, None)
     
     def break_block(self, x, y):
-        if 0 <= x < self.width and 0 <= y < self.height:
-            block_type = self.blocks[x][y]
+        if self.in_bounds(x, y):
+            block_type = self.get_block(x, y)
             if block_type is not None:
                 # 生成掉落物
-                drop_type = BLOCK_DROPS.get(block_type)
-                if drop_type:
-                    drop_x = x * TILE_SIZE + TILE_SIZE / 2
-                    drop_y = y * TILE_SIZE + TILE_SIZE / 2
-                    self.dropped_items.append(DroppedItem(drop_x, drop_y, drop_type))
+                drop_x = x * TILE_SIZE + TILE_SIZE / 2
+                drop_y = y * TILE_SIZE + TILE_SIZE / 2
+                drop_id = DROP_LOOKUP[BLOCK_IDS[block_type]]
+                if drop_id != AIR:
+                    self.dropped_items.spawn(drop_x, drop_y, BLOCK_NAMES[drop_id])
+                # 箱子、熔炉里的东西也一起掉出来
+                entity = self.tile_entity_at(x, y)
+                if entity is not None:
+                    for item_type, count in entity.contents():
+                        self.dropped_items.spawn(drop_x, drop_y, item_type, count)
                 # 移除方块
-                self.blocks[x][y] = None
+                self.set_block(x, y, None)
     
-    def update_items(self, player):
-        # 更新掉落物并检查拾取
-        items_to_remove = []
-        for item in self.dropped_items:
-            item.update(self)
-            if player.can_pickup(item):
-                player.pickup_item(item.item_type)
-                items_to_remove.append(item)
-        
-        # 移除被拾取的物品
-        for item in items_to_remove:
-            self.dropped_items.remove(item)
+    def update_items(self, *players):
+        # 更新掉落物、合并同类堆叠并检查拾取
+        self.dropped_items.step(self)
+        self.dropped_items.merge()
+        for player in players:
+            self.dropped_items.collect(player)
     
     def draw_block_damage(self, screen, camera, block_images):
         for block_key, damage in self.block_damage.items():
             x, y = map(int, block_key.split(','))
-            block = self.blocks[x][y]
-            if block:
-                hardness = BLOCK_PROPERTIES[block]["hardness"]
+            block_id = self.get_block_id(x, y)
+            if block_id != AIR:
+                hardness = HARDNESS_LOOKUP[block_id]
                 damage_stage = int((damage / hardness) * 10)  # 0-9 的损坏阶段
                 
                 # 计算屏幕位置
@@ -324,10 +2252,148 @@ class World:
                     if cursor_name in block_images:
                         screen.blit(block_images[cursor_name], (screen_x, screen_y))
 
+class ChunkRenderer:
+    """把区块按段预先画到离屏 Surface 上缓存起来，每帧只需贴几张大图"""
+    def __init__(self, world, block_images):
+        self.world = world
+        self.block_images = block_images
+        self.tiles = block_tiles(block_images)  # 方块ID -> 贴图
+        self.darkness = darkness_overlays()
+        self.surfaces = {}  # (cx, 段号) -> Surface
+        self.blits = 0  # 上一次 draw 的贴图次数（含重画缓存的），给性能统计用
+        world.add_block_listener(self.invalidate)
+        world.add_light_listener(self.invalidate_rect)
+        world.add_area_listener(self.invalidate_rect)
+    
+    def invalidate(self, x, y):
+        # 方块变化时只丢掉它所在那一段的缓存，下次绘制时重画
+        self.surfaces.pop((x // CHUNK_SIZE, y // SECTION_HEIGHT), None)
+    
+    def invalidate_rect(self, x0, y0, x1, y1):
+        for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+            for section in range(y0 // SECTION_HEIGHT, (y1 - 1) // SECTION_HEIGHT + 1):
+                self.surfaces.pop((cx, section), None)
+    
+    def render_section(self, cx, section):
+        # 背景直接画成天空色，得到不透明的图，贴到屏幕上是最快的整块拷贝
+        surface = pygame.Surface((CHUNK_SIZE * TILE_SIZE, SECTION_HEIGHT * TILE_SIZE)).convert()
+        surface.fill(SKY_COLOR)
+        chunk = self.world.get_chunk(cx)
+        rows = slice(section * SECTION_HEIGHT, (section + 1) * SECTION_HEIGHT)
+        self.blits += blit_tiles(surface, self.tiles, self.darkness, chunk.blocks[:, rows],
+                                 chunk.light[:, :, rows].max(axis=0), 0, 0)
+        return surface
+    
+    def draw(self, screen, camera):
+        # 丢掉已卸载区块的缓存
+        for key in [key for key in self.surfaces if not self.world.is_chunk_loaded(key[0])]:
+            del self.surfaces[key]
+        
+        section_width = CHUNK_SIZE * TILE_SIZE
+        section_height = SECTION_HEIGHT * TILE_SIZE
+        first_cx = int(camera.scroll_x // section_width)
+        last_cx = int((camera.scroll_x + WINDOW_WIDTH) // section_width)
+        first_section = max(0, int(camera.scroll_y // section_height))
+        last_section = min((self.world.height - 1) // SECTION_HEIGHT,
+                           int((camera.scroll_y + WINDOW_HEIGHT) // section_height))
+        self.blits = 0
+        for cx in range(first_cx, last_cx + 1):
+            for section in range(first_section, last_section + 1):
+                surface = self.surfaces.get((cx, section))
+                if surface is None:
+                    surface = self.surfaces[(cx, section)] = self.render_section(cx, section)
+                # 屏幕位置向下取整：pygame 把浮点坐标向零截断，最左边那块是负坐标，不取整会和别的段差一个像素
+                screen.blit(surface, (math.floor(cx * section_width - camera.scroll_x),
+                                      math.floor(section * section_height - camera.scroll_y)))
+                self.blits += 1
+
+class ScrollRenderer:
+    """持久的世界图层：镜头移动时平移上一帧的画面，只补画新露出来的条带和变化过的方块"""
+    def __init__(self, world, block_images):
+        self.world = world
+        self.block_images = block_images
+        self.tiles = block_tiles(block_images)  # 方块ID -> 贴图
+        self.darkness = darkness_overlays()
+        self.layer = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+        self.origin = None  # 图层左上角对应的世界像素坐标，None 表示需要整屏重画
+        self.dirty_tiles = set()
+        self.dirty_rects = []  # 光照或成片方块变化的矩形 (x0, y0, x1, y1)
+        self.blits = 0  # 上一次 draw 的贴图次数，给性能统计用
+        world.add_block_listener(self.mark_dirty)
+        world.add_light_listener(self.mark_dirty_rect)
+        world.add_area_listener(self.mark_dirty_rect)
+    
+    def mark_dirty(self, x, y):
+        self.dirty_tiles.add((x, y))
+    
+    def mark_dirty_rect(self, x0, y0, x1, y1):
+        self.dirty_rects.append((x0, y0, x1, y1))
+    
+    def paint_rect(self, left, top, right, bottom):
+        """重画世界像素矩形 [left, right) x [top, bottom) 覆盖到的图层区域"""
+        origin_x, origin_y = self.origin
+        self.layer.set_clip(pygame.Rect(left - origin_x, top - origin_y, right - left, bottom - top))
+        self.layer.fill(SKY_COLOR)
+        tile_x0, tile_y0 = left // TILE_SIZE, top // TILE_SIZE
+        tile_x1, tile_y1 = (right - 1) // TILE_SIZE + 1, (bottom - 1) // TILE_SIZE + 1
+        blocks = self.world.get_region(tile_x0, tile_y0, tile_x1, tile_y1)
+        light = self.world.get_light_region(tile_x0, tile_y0, tile_x1, tile_y1)
+        self.blits += blit_tiles(self.layer, self.tiles, self.darkness, blocks, light,
+                                 tile_x0 * TILE_SIZE - origin_x, tile_y0 * TILE_SIZE - origin_y)
+        self.layer.set_clip(None)
+    
+    def draw(self, screen, camera):
+        # 和 ChunkRenderer、精灵一样，世界像素 X 画在 floor(X - scroll) = X - ceil(scroll) 处；
+        # int() 向零截断，正的 scroll 会比别的绘制路径偏一个像素
+        scroll_x, scroll_y = math.ceil(camera.scroll_x), math.ceil(camera.scroll_y)
+        if self.origin is None:
+            dx, dy = WINDOW_WIDTH, WINDOW_HEIGHT
+        else:
+            dx, dy = scroll_x - self.origin[0], scroll_y - self.origin[1]
+        self.origin = (scroll_x, scroll_y)
+        right, bottom = scroll_x + WINDOW_WIDTH, scroll_y + WINDOW_HEIGHT
+        self.blits = 1  # 最后贴整张图层
+        
+        if abs(dx) >= WINDOW_WIDTH or abs(dy) >= WINDOW_HEIGHT:
+            # 移动太远，整屏重画
+            self.paint_rect(scroll_x, scroll_y, right, bottom)
+        elif dx or dy:
+            # 平移旧画面，再补画新露出来的横条和竖条
+            self.layer.scroll(-dx, -dy)
+            if dx > 0:
+                self.paint_rect(right - dx, scroll_y, right, bottom)
+            elif dx < 0:
+                self.paint_rect(scroll_x, scroll_y, scroll_x - dx, bottom)
+            if dy > 0:
+                self.paint_rect(scroll_x, bottom - dy, right, bottom)
+            elif dy < 0:
+                self.paint_rect(scroll_x, scroll_y, right, scroll_y - dy)
+        
+        # 重画变化过、且在视野内的方块和光照
+        rects = [(x, y, x + 1, y + 1) for x, y in self.dirty_tiles] + self.dirty_rects
+        for x0, y0, x1, y1 in rects:
+            left, top = x0 * TILE_SIZE, y0 * TILE_SIZE
+            rect_right, rect_bottom = x1 * TILE_SIZE, y1 * TILE_SIZE
+            if left < right and rect_right > scroll_x and top < bottom and rect_bottom > scroll_y:
+                self.paint_rect(max(left, scroll_x), max(top, scroll_y),
+                                min(rect_right, right), min(rect_bottom, bottom))
+        self.dirty_tiles.clear()
+        self.dirty_rects.clear()
+        
+        screen.blit(self.layer, (0, 0))
+
+# 可选的世界渲染方式
+RENDERERS = {
+    "chunks": ChunkRenderer,
+    "scroll": ScrollRenderer,
+}
+
 class Player:
     def __init__(self, x, y):
         self.x = x
         self.y = y
+        self.prev_x = x  # 上一步的位置，渲染时在两步之间插值
+        self.prev_y = y
         self.width = TILE_SIZE
         self.height = TILE_SIZE * 2
         self.velocity_y = 0
@@ -340,247 +2406,1048 @@ class Player:
         self.inventory = {block_type: 0 for block_type in BLOCK_TYPES}  # 物品栏
     
     def move(self, dx, world):
-        new_x = self.x + dx * self.speed
-        
-        # 检查水平移动碰撞
-        if dx > 0:  # 向右移动
-            right_tile = int((new_x + self.width) // TILE_SIZE)
-            top_tile = int(self.y // TILE_SIZE)
-            bottom_tile = int((self.y + self.height - 1) // TILE_SIZE)
-            
-            can_move = True
-            for y in range(top_tile, bottom_tile + 1):
-                if 0 <= right_tile < world.width and 0 <= y < world.height:
-                    block = world.blocks[right_tile][y]
-                    if block is not None and BLOCK_PROPERTIES[block]["solid"]:
-                        new_x = right_tile * TILE_SIZE - self.width
-                        can_move = False
-                        break
-        
-        elif dx < 0:  # 向左移动
-            left_tile = int(new_x // TILE_SIZE)
-            top_tile = int(self.y // TILE_SIZE)
-            bottom_tile = int((self.y + self.height - 1) // TILE_SIZE)
-            
-            can_move = True
-            for y in range(top_tile, bottom_tile + 1):
-                if 0 <= left_tile < world.width and 0 <= y < world.height:
-                    block = world.blocks[left_tile][y]
-                    if block is not None and BLOCK_PROPERTIES[block]["solid"]:
-                        new_x = (left_tile + 1) * TILE_SIZE
-                        can_move = False
-                        break
-        
-        self.x = new_x
-        self.x = max(0, min(self.x, world.width * TILE_SIZE - self.width))
+        # 水平移动，撞墙就贴着墙停下
+        self.x, _ = sweep_x(world, self.x, self.y, self.width, self.height, dx * self.speed)
     
     def update(self, world):
         # 应用重力
         self.velocity_y += self.gravity
         self.velocity_y = min(self.velocity_y, 15)
         
-        # 垂直移动
-        new_y = self.y + self.velocity_y
-        
-        # 检查垂直碰撞
-        left_tile = int(self.x // TILE_SIZE)
-        right_tile = int((self.x + self.width - 1) // TILE_SIZE)
-        
-        # 检查碰撞
-        if self.velocity_y > 0:  # 下落
-            bottom_tile = int((new_y + self.height) // TILE_SIZE)
-            for x in range(left_tile, right_tile + 1):
-                if 0 <= x < world.width and 0 <= bottom_tile < world.height:
-                    block = world.blocks[x][bottom_tile]
-                    if block is not None and BLOCK_PROPERTIES[block]["solid"]:
-                        new_y = bottom_tile * TILE_SIZE - self.height
-                        self.velocity_y = 0
-                        self.jumping = False
-                        break
-        elif self.velocity_y < 0:  # 上升
-            top_tile = int(new_y // TILE_SIZE)
-            for x in range(left_tile, right_tile + 1):
-                if 0 <= x < world.width and 0 <= top_tile < world.height:
-                    block = world.blocks[x][top_tile]
-                    if block is not None and BLOCK_PROPERTIES[block]["solid"]:
-                        new_y = (top_tile + 1) * TILE_SIZE
-                        self.velocity_y = 0
-                        break
-        
-        self.y = new_y
+        # 垂直移动并检查碰撞
+        self.y, hit = sweep_y(world, self.x, self.y, self.width, self.height, self.velocity_y)
+        if hit:
+            if self.velocity_y > 0:  # 落地
+                self.jumping = False
+            self.velocity_y = 0
         
         if self.y > world.height * TILE_SIZE:
             self.y = 0
             self.velocity_y = 0
     
+    def render_position(self, alpha):
+        """上一步和这一步之间 alpha 处的位置"""
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+    
     def get_selected_block(self):
         return BLOCK_TYPES[self.selected_block]
     
-    def can_pickup(self, item):
-        # 计算与掉落物的距离
-        dx = item.x + item.size/2 - (self.x + self.width/2)
-        dy = item.y + item.size/2 - (self.y + self.height/2)
-        distance = math.sqrt(dx * dx + dy * dy)
-        return distance < self.pickup_range
+    def pickup_item(self, item_type, count=1):
+        self.inventory[item_type] += count
+
+class FrameProfiler:
+    """按阶段统计每帧耗时，F3 显示调试信息，也可以把每帧数据写进 CSV。
+    
+    关闭时每个打点只多一次属性判断。
+    """
+    def __init__(self, csv_path=None):
+        self.overlay_visible = False
+        self.enabled = False  # 这一帧是否在计时，只在帧开始时切换
+        self.index = {phase: i for i, phase in enumerate(PROFILE_PHASES)}
+        self.times = np.zeros(len(PROFILE_PHASES))  # 当前帧各阶段累计的秒数
+        self.history = np.zeros((PROFILE_HISTORY, len(PROFILE_PHASES)))  # 最近若干帧，环形缓冲
+        self.frames = 0
+        self.counts = dict.fromkeys(PROFILE_COUNTS, 0)
+        self.last = 0.0
+        self.font = None
+        self.overlay = None
+        self.csv_file = None
+        if csv_path is not None:
+            self.csv_file = open(csv_path, "w", newline="")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(["frame"] + [f"{phase}_ms" for phase in PROFILE_PHASES] +
+                                     ["total_ms"] + list(PROFILE_COUNTS))
+    
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.overlay = None
+    
+    def begin_frame(self):
+        self.enabled = self.overlay_visible or self.csv_file is not None
+        if self.enabled:
+            self.times[:] = 0
+            self.last = time.perf_counter()
+    
+    def mark(self, phase):
+        """把上次打点到现在的时间记到 phase 上"""
+        if self.enabled:
+            now = time.perf_counter()
+            self.times[self.index[phase]] += now - self.last
+            self.last = now
+    
+    def end_frame(self, **counts):
+        self.counts.update(counts)
+        self.history[self.frames % PROFILE_HISTORY] = self.times
+        self.frames += 1
+        if self.csv_file is not None:
+            times_ms = self.times * 1000
+            self.csv_writer.writerow([self.frames] + [f"{t:.3f}" for t in times_ms] +
+                                     [f"{times_ms.sum():.3f}"] + [self.counts[name] for name in PROFILE_COUNTS])
+    
+    def draw(self, screen):
+        if not self.overlay_visible:
+            return
+        # 文字排版比较慢，隔几帧才重新生成一次
+        if self.overlay is None or self.frames % PROFILE_OVERLAY_INTERVAL == 0:
+            self.overlay = self.render_overlay()
+        screen.blit(self.overlay, (4, 4))
+    
+    def render_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        history = self.history[:min(self.frames, PROFILE_HISTORY)]
+        if len(history) == 0:
+            history = self.history[:1]
+        average = history.mean(axis=0) * 1000
+        worst = history.max(axis=0) * 1000
+        totals = history.sum(axis=1) * 1000
+        # 每行按列排版：阶段名、平均值、最坏值分别对齐
+        rows = [["frame", f"{totals.mean():.2f}", f"{totals.max():.2f}"]]
+        rows += [[phase, f"{average[i]:.2f}", f"{worst[i]:.2f}"] for i, phase in enumerate(PROFILE_PHASES)]
+        header = f"ms avg / worst of {len(history)} frames ({1000 / max(totals.mean(), 1e-6):.0f} fps)"
+        footer = "  ".join(f"{name} {self.counts[name]}" for name in PROFILE_COUNTS)
+        
+        line_height = self.font.get_linesize()
+        columns = [max(self.font.size(row[c])[0] for row in rows) + 12 for c in range(3)]
+        width = max(sum(columns), self.font.size(header)[0], self.font.size(footer)[0]) + 8
+        surface = pygame.Surface((width, line_height * (len(rows) + 2) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        white = (255, 255, 255)
+        surface.blit(self.font.render(header, True, white), (4, 4))
+        for i, row in enumerate(rows):
+            y = 4 + (i + 1) * line_height
+            surface.blit(self.font.render(row[0], True, white), (4, y))
+            # 数字右对齐
+            right = 4 + columns[0]
+            for c in (1, 2):
+                right += columns[c]
+                text = self.font.render(row[c], True, white)
+                surface.blit(text, (right - 12 - text.get_width(), y))
+        surface.blit(self.font.render(footer, True, white), (4, 4 + (len(rows) + 1) * line_height))
+        return surface
     
-    def pickup_item(self, item_type):
-        self.inventory[item_type] += 1
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
 
-def main():
-    clock = pygame.time.Clock()
-    block_images = load_images()
-    world = World(100, 100)
-    player = Player(WINDOW_WIDTH // 2, 0)
-    camera = Camera(100 * TILE_SIZE, 100 * TILE_SIZE)
+class TickInput:
+    """一个模拟步的玩家输入"""
+    def __init__(self, dx=0, jump=False, mine=None, place=()):
+        self.dx = dx
+        self.jump = jump
+        self.mine = mine  # 正在挖掘的方块坐标，None 表示没有按住左键
+        self.place = list(place)  # 这一步要放置方块的坐标
+
+def apply_input(world, player, tick_input, miner=None):
+    """把一步的输入作用到玩家身上：放置、挖掘、跳跃和移动。miner 区分多人模式里各自的挖掘进度"""
+    player.prev_x, player.prev_y = player.x, player.y
     
-    running = True
-    mouse_pressed = False  # 跟踪鼠标按下状态
+    for x, y in tick_input.place:
+        world.place_block(x, y, player.get_selected_block(), player)
+    
+    # 按住左键时继续挖掘，松开就重置方块损坏程度
+    if tick_input.mine is not None:
+        world.damage_block(*tick_input.mine, miner)
+    elif miner in world.mining:
+        world.reset_block_damage(miner)
+    
+    if tick_input.jump and not player.jumping:
+        player.velocity_y = player.jump_force
+        player.jumping = True
+    
+    player.move(tick_input.dx, world)
+    player.update(world)
+
+def step_world(world, profiler=None):
+    """推进世界自己的一步：方块实体、方块更新和光照"""
+    # 熔炉等醒着的方块实体
+    world.tick_tile_entities()
+    if profiler is not None:
+        profiler.mark("tiles")
+    
+    # 方块更新：沙子下落、流体流动
+    world.update_blocks()
+    if profiler is not None:
+        profiler.mark("blocks")
+    
+    # 这一步里方块变化影响到的光照
+    world.update_lighting()
+    if profiler is not None:
+        profiler.mark("light")
+
+def simulate_tick(world, player, camera, tick_input, profiler=None):
+    """推进一个固定时长的模拟步，与渲染帧率无关"""
+    apply_input(world, player, tick_input)
+    if profiler is not None:
+        profiler.mark("player")
+    camera.update(player)
+    world.update_chunks(camera)
+    if profiler is not None:
+        profiler.mark("chunks")
     
-    while running:
+    # 更新掉落物和拾取检测
+    world.update_items(player)
+    if profiler is not None:
+        profiler.mark("items")
+    
+    step_world(world, profiler)
+
+def wander_input(tick, player, world):
+    """无头模式的自动输入：来回走，挖开挡路的方块，时不时跳一下，让区块加载和掉落物都动起来"""
+    dx = 1 if (tick // WANDER_PERIOD) % 2 == 0 else -1
+    front_x = int((player.x + player.width / 2) // TILE_SIZE) + dx
+    head_y = int(player.y // TILE_SIZE)
+    feet_y = int((player.y + player.height - 1) // TILE_SIZE)
+    mine_y = head_y if world.get_block_id(front_x, head_y) != AIR else feet_y
+    return TickInput(dx, jump=tick % WANDER_JUMP_INTERVAL == 0, mine=(front_x, mine_y))
+
+class LocalInput:
+    """读取本机的键盘和鼠标，每帧攒成一个 TickInput"""
+    def __init__(self):
+        self.running = True
+        self.mouse_pressed = False  # 跟踪鼠标按下状态
+        self.place = []  # 点击要放置方块的位置，一直留到有模拟步用掉为止（有的帧一步也不跑）
+    
+    def poll(self, camera, profiler=None):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
+                self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                if profiler is not None:
+                    profiler.toggle_overlay()  # F3 显示/隐藏调试信息
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # 左键
-                    mouse_pressed = True
+                    self.mouse_pressed = True
                 elif event.button == 3:  # 右键放置方块
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     world_x = int((mouse_x + camera.scroll_x) // TILE_SIZE)
                     world_y = int((mouse_y + camera.scroll_y) // TILE_SIZE)
-                    world.place_block(world_x, world_y, player.get_selected_block(), player)
+                    self.place.append((world_x, world_y))
             elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1:  # 左键释放
-                    mouse_pressed = False
-                    world.reset_block_damage()  # 重置方块损坏程度
-        
-        # 如果鼠标左键被按住，继续挖掘
-        if mouse_pressed:
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            world_x = int((mouse_x + camera.scroll_x) // TILE_SIZE)
-            world_y = int((mouse_y + camera.scroll_y) // TILE_SIZE)
-            world.damage_block(world_x, world_y)
+                    self.mouse_pressed = False
         
-        # 玩家移动控制
+        # 收集这一帧的输入，之后的每个模拟步都用它
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        world_x = int((mouse_x + camera.scroll_x) // TILE_SIZE)
+        world_y = int((mouse_y + camera.scroll_y) // TILE_SIZE)
         keys = pygame.key.get_pressed()
         dx = 0
         if keys[pygame.K_a]:
             dx = -1
         if keys[pygame.K_d]:
             dx = 1
-        if keys[pygame.K_w] and not player.jumping:
-            player.velocity_y = player.jump_force
-            player.jumping = True
-        
-        player.move(dx, world)
-        player.update(world)
-        camera.update(player)
-        
-        # 绘制
-        screen.fill(SKY_COLOR)
-        
-        # 绘制世界
-        for x in range(world.width):
-            screen_x = x * TILE_SIZE - camera.scroll_x
-            if -TILE_SIZE <= screen_x <= WINDOW_WIDTH:
-                for y in range(world.height):
-                    screen_y = y * TILE_SIZE - camera.scroll_y
-                    if -TILE_SIZE <= screen_y <= WINDOW_HEIGHT:
-                        block = world.blocks[x][y]
-                        if block and block in block_images:
-                            screen.blit(block_images[block], (screen_x, screen_y))
-        
-        # 绘制玩家
-        pygame.draw.rect(screen, (255, 0, 0), 
-                        (player.x - camera.scroll_x, 
-                         player.y - camera.scroll_y, 
-                         player.width, player.height))
-        
-        # 绘制物品栏
-        hotbar_x = (WINDOW_WIDTH - HOTBAR_IMAGE.get_width()) // 2
-        hotbar_y = WINDOW_HEIGHT - HOTBAR_IMAGE.get_height() - HOTBAR_Y_OFFSET
-        screen.blit(HOTBAR_IMAGE, (hotbar_x, hotbar_y))
-        
-        # 绘制物品栏中的方块
-        visible_slots = 0  # 跟踪可见的物品槽数量
-        for i, block_type in enumerate(BLOCK_TYPES):
-            if block_type in block_images and player.inventory[block_type] > 0:  # 只显示拥有的物品
-                # 为第一个和第二个物品特别处理
-                if visible_slots == 0:
-                    slot_x = hotbar_x + HOTBAR_PADDING
-                elif visible_slots == 1:
-                    # 第二个物品使用更大的间距
-                    slot_x = hotbar_x + HOTBAR_PADDING + (int(SLOT_SIZE * 6.0))
-                else:
-                    # 其他物品使用固定间距
-                    slot_x = hotbar_x + HOTBAR_PADDING + (int(SLOT_SIZE * 4.0) * visible_slots)
-                
-                slot_y = hotbar_y + HOTBAR_PADDING
-                
-                # 计算物品大小
-                item_size = int(SLOT_SIZE * ITEM_SCALE)
-                
-                # 缩放方块图像
-                scaled_block = pygame.transform.scale(block_images[block_type], 
-                                                   (item_size, item_size))
-                
-                # 计算物品位置
-                item_x = slot_x + ITEM_PADDING
-                item_y = slot_y + ITEM_VERTICAL_OFFSET
-                
-                # 绘制方块
-                screen.blit(scaled_block, (item_x, item_y))
-                
-                # 绘制物品数量（增大字体）
-                count_text = str(player.inventory[block_type])
-                font = pygame.font.Font(None, int(SLOT_SIZE * 2))  # 增大字体大小
-                text_surface = font.render(count_text, True, (255, 255, 255))
-                text_rect = text_surface.get_rect()
-                
-                # 调整数字位置（右下角，稍微偏移以适应更大的字体）
-                text_rect.bottomright = (slot_x + SLOT_SIZE + 4, 
-                                       slot_y + SLOT_SIZE + 4)
-                
-                # 绘制文字阴影
-                shadow_surface = font.render(count_text, True, (0, 0, 0))
-                screen.blit(shadow_surface, (text_rect.x + 2, text_rect.y + 2))  # 增大阴影偏移
-                screen.blit(text_surface, text_rect)
-                
-                # 绘制选中框
-                if i == player.selected_block:
-                    pygame.draw.rect(screen, (255, 255, 255), 
-                                   (slot_x, slot_y, 
-                                    SLOT_SIZE - 1, SLOT_SIZE - 1), 1)
-                
-                visible_slots += 1  # 增加可见槽位计数
+        return TickInput(dx, keys[pygame.K_w], (world_x, world_y) if self.mouse_pressed else None, self.place)
+    
+    def consume(self, tick_input):
+        """一个模拟步用掉了 tick_input：放置只做一次，同一帧后面的模拟步和下一帧都不再放"""
+        tick_input.place = []
+        self.place = []
+
+def draw_player(screen, camera, player, alpha, color=PLAYER_COLOR):
+    player_x, player_y = player.render_position(alpha)
+    pygame.draw.rect(screen, color, (player_x - camera.scroll_x, player_y - camera.scroll_y,
+                                     player.width, player.height))
+
+def draw_cursor(screen, camera, world, block_images):
+    # 获取当前鼠标指向的方块位置
+    mouse_x, mouse_y = pygame.mouse.get_pos()
+    world_x = int((mouse_x + camera.scroll_x) // TILE_SIZE)
+    world_y = int((mouse_y + camera.scroll_y) // TILE_SIZE)
+    
+    # 在所有方块和物品渲染之后，绘制光标
+    cursor_screen_x = world_x * TILE_SIZE - camera.scroll_x
+    cursor_screen_y = world_y * TILE_SIZE - camera.scroll_y
+    
+    # 只在没有挖掘进行时显示普通光标
+    block_key = f"{world_x},{world_y}"
+    if block_key not in world.block_damage and "cursor" in block_images:
+        screen.blit(block_images["cursor"], (cursor_screen_x, cursor_screen_y))
+
+def draw_scene(screen, camera, world, player, alpha, world_renderer, hotbar, sprites, block_images, profiler):
+    """画一帧的世界、玩家、物品栏、掉落物和挖掘裂纹（不含光标和调试信息）"""
+    # 绘制世界（两种渲染方式都会盖满整个屏幕，不需要先填充天空色）
+    world_renderer.draw(screen, camera)
+    profiler.mark("world")
+    
+    # 绘制玩家
+    draw_player(screen, camera, player, alpha)
+    
+    # 绘制物品栏（缓存好的一整张图）
+    hotbar.draw(screen, player)
+    profiler.mark("hotbar")
+    
+    # 绘制掉落物
+    world.dropped_items.draw(screen, camera, sprites, alpha)
+    
+    # 在绘制完方块后绘制损坏效果
+    world.draw_block_damage(screen, camera, block_images)
+
+def create_world(world_dir=None, save_mode="full", seed=None):
+    """读取存档或新建世界，并预生成出生点附近的区块，返回 (world, player)"""
+    if world_dir is not None and os.path.exists(os.path.join(world_dir, "level.dat")):
+        world, player = World.load(world_dir)
+    else:
+        world = World(WORLD_HEIGHT, seed=seed, save_dir=world_dir, save_mode=save_mode)
+        player = Player(WINDOW_WIDTH // 2, 0)
+    # 只预生成出生点附近还没有存档的区块
+    spawn_cx = int(player.x // TILE_SIZE) // CHUNK_SIZE
+    world.pregenerate(spawn_cx - SPAWN_PREGENERATE_CHUNKS, spawn_cx + SPAWN_PREGENERATE_CHUNKS)
+    return world, player
+
+def run_headless(ticks=HEADLESS_TICKS, world_dir=None, save_mode="full", seed=None,
+                 autosave_interval=AUTOSAVE_INTERVAL, record=None):
+    """不开窗口，用自动输入尽快跑 ticks 个模拟步，返回每秒步数；record 为录像文件路径"""
+    # 换成 SDL 的 dummy 驱动，即使有代码碰到显示模块也不会打开窗口
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.quit()
+    pygame.display.init()
+    
+    world, player = create_world(world_dir, save_mode, seed)
+    camera = Camera(WORLD_HEIGHT * TILE_SIZE)
+    recorder = InputRecorder(world) if record is not None else None
+    start = time.perf_counter()
+    for tick in range(ticks):
+        tick_input = wander_input(tick, player, world)
+        if recorder is not None:
+            recorder.record(tick_input)
+        simulate_tick(world, player, camera, tick_input)
+        if world_dir is not None:
+            world.autosave(player, autosave_interval)
+    elapsed = time.perf_counter() - start
+    
+    if recorder is not None:
+        recorder.save(record, world, player)
+    if world_dir is not None:
+        world.save(player)
+    world.close()
+    return ticks / elapsed if elapsed > 0 else float("inf")
+
+# 多人模式：服务器持有唯一的权威世界，客户端只发输入，收区块、方块变化和玩家位置。
+# 每条消息是 NET_HEADER（载荷长度, 类型）加载荷，一步里发给同一个客户端的消息拼成一次写入。
+NET_MAGIC = b"MC2N"
+NET_VERSION = 1
+NET_HEADER = struct.Struct("<IB")
+NET_HELLO = struct.Struct("<4sH")  # 魔数, 协议版本
+NET_WELCOME = struct.Struct("<IQHdd")  # 玩家编号, 世界种子, 世界高度, 出生位置
+NET_INPUT = struct.Struct("<IbBBiiB")  # 序号, dx, 跳跃, 是否在挖, 挖的坐标, 放置个数（后面跟放置坐标）
+NET_STATE = struct.Struct("<IIH")  # 世界步数, 已处理的最后一个输入序号, 玩家个数（后面跟玩家数组）
+NET_CHUNK = struct.Struct("<i")  # 区块号（CHUNK 消息后面跟相对种子地形的差异）
+NET_PLAYER_DTYPE = np.dtype([("id", "<u4"), ("x", "<f4"), ("y", "<f4")])
+NET_TILE_DTYPE = np.dtype([("x", "<i4"), ("y", "<u2"), ("id", BLOCK_ID_DTYPE)])
+(
+    MSG_HELLO, MSG_INPUT,  # 客户端 -> 服务器
+    MSG_WELCOME, MSG_STATE, MSG_INVENTORY, MSG_CHUNK, MSG_UNLOAD, MSG_TILES,  # 服务器 -> 客户端
+) = range(8)
+
+def write_message(out, kind, *parts):
+    """把一条消息追加到 out（bytearray）"""
+    out += NET_HEADER.pack(sum(len(part) for part in parts), kind)
+    for part in parts:
+        out += part
+
+async def read_message(reader):
+    length, kind = NET_HEADER.unpack(await reader.readexactly(NET_HEADER.size))
+    if length > NET_MAX_MESSAGE:
+        raise ConnectionError(f"message too large: {length}")
+    return kind, await reader.readexactly(length)
+
+def encode_input(seq, tick_input):
+    place = tick_input.place[:255]
+    mine = tick_input.mine
+    return (NET_INPUT.pack(seq, tick_input.dx, tick_input.jump, mine is not None, *(mine or (0, 0)), len(place))
+            + np.array(place, dtype="<i4").tobytes())
+
+def decode_input(payload):
+    """解出 (序号, TickInput)；dx 截到 [-1, 1]，客户端不能走得比别人快"""
+    seq, dx, jump, mining, mine_x, mine_y, count = NET_INPUT.unpack_from(payload, 0)
+    place = np.frombuffer(payload, dtype="<i4", count=2 * count, offset=NET_INPUT.size).reshape(-1, 2)
+    return seq, TickInput(max(-1, min(dx, 1)), bool(jump), (mine_x, mine_y) if mining else None,
+                          [tuple(cell) for cell in place.tolist()])
+
+def restrict_input(player, tick_input):
+    """服务器不信任客户端发来的坐标：只留下玩家够得着的挖掘和放置，放置个数也有上限。
+    在碰任何区块之前过滤，远处的坐标不会让服务器去生成、点亮区块"""
+    center_x = int((player.x + player.width / 2) // TILE_SIZE)
+    center_y = int((player.y + player.height / 2) // TILE_SIZE)
+    mine = tick_input.mine
+    if mine is not None and (abs(mine[0] - center_x) > NET_REACH or abs(mine[1] - center_y) > NET_REACH):
+        mine = None
+    place = [(x, y) for x, y in tick_input.place[:NET_MAX_PLACE]
+             if abs(x - center_x) <= NET_REACH and abs(y - center_y) <= NET_REACH]
+    return TickInput(tick_input.dx, tick_input.jump, mine, place)
+
+class ClientConnection:
+    """服务器这边的一个玩家连接：输入队列、已经发给它的区块"""
+    def __init__(self, player_id, player, writer, height):
+        self.id = player_id
+        self.player = player
+        self.camera = Camera(height * TILE_SIZE)
+        self.writer = writer
+        self.inputs = deque(maxlen=NET_INPUT_BACKLOG)  # (序号, TickInput)，满了自动丢掉最旧的
+        self.held = TickInput()  # 没有新输入时沿用上一步按住的键
+        self.ack = 0  # 已处理的最后一个输入序号，客户端用来算延迟
+        self.chunks = set()  # 客户端手上有的区块
+        self.inventory = None  # 上次发出去的物品栏
+    
+    def next_input(self):
+        if self.inputs:
+            self.ack, tick_input = self.inputs.popleft()
+            self.held = TickInput(tick_input.dx, tick_input.jump, tick_input.mine)
+            return tick_input
+        return self.held
+
+class GameServer:
+    """多人模式的权威服务器：在 asyncio 事件循环里按固定步长模拟世界，
+    把区块（相对种子地形的差异）和每一步的方块变化（一步一批）推给视野覆盖到的客户端"""
+    def __init__(self, world, spawn, autosave_interval=None):
+        self.world = world
+        self.spawn = spawn  # 新玩家从这里出生，存档里也记它
+        self.autosave_interval = autosave_interval  # None 表示不自动存档
+        self.clients = {}  # 玩家编号 -> ClientConnection，按加入顺序模拟
+        self.next_id = 1
+        self.changed = {}  # 这一步变化过的格子（只用键）
+        self.ticks = 0  # serve 里已经跑了的步数
+        self.tick_times = deque(maxlen=NET_STATS_WINDOW)  # 最近每步的耗时（秒）
+        self.bytes_sent = 0
+        self.peak_clients = 0
+        self.port = None
+        self.started = asyncio.Event()
+        self.running = False
+        world.add_block_listener(self.block_changed)
+        world.add_area_listener(self.area_changed)
+    
+    def block_changed(self, x, y):
+        self.changed[(x, y)] = None
+    
+    def area_changed(self, x0, y0, x1, y1):
+        for x in range(x0, x1):
+            for y in range(y0, y1):
+                self.changed[(x, y)] = None
+    
+    async def serve(self, host, port, ticks=None):
+        """监听 host:port（0 表示随便找个空闲端口）并运行模拟，直到 stop() 或跑满 ticks 步"""
+        server = await asyncio.start_server(self.handle_client, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.running = True
+        self.started.set()
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while self.running and (ticks is None or self.ticks < ticks):
+                start = time.perf_counter()
+                self.step()
+                self.tick_times.append(time.perf_counter() - start)
+                self.ticks += 1
+                next_tick += TICK_TIME
+                delay = next_tick - loop.time()
+                if delay < -MAX_FRAME_TIME:
+                    next_tick = loop.time()  # 落后太多就不追了，宁可变慢
+                await asyncio.sleep(max(delay, 0.0))
+        finally:
+            server.close()
+            for client in list(self.clients.values()):
+                client.writer.close()
+    
+    def stop(self):
+        self.running = False
+    
+    async def handle_client(self, reader, writer):
+        client = None
+        try:
+            kind, payload = await read_message(reader)
+            if kind != MSG_HELLO or NET_HELLO.unpack(payload) != (NET_MAGIC, NET_VERSION):
+                return
+            client = ClientConnection(self.next_id, Player(self.spawn.x, self.spawn.y), writer, self.world.height)
+            self.next_id += 1
+            out = bytearray()
+            write_message(out, MSG_WELCOME, NET_WELCOME.pack(client.id, self.world.seed, self.world.height,
+                                                             client.player.x, client.player.y))
+            writer.write(out)
+            self.clients[client.id] = client
+            self.peak_clients = max(self.peak_clients, len(self.clients))
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == MSG_INPUT:
+                    client.inputs.append(decode_input(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error, ValueError):
+            pass  # 断开或发来坏数据的客户端直接踢掉
+        finally:
+            if client is not None:
+                self.clients.pop(client.id, None)
+                self.world.reset_block_damage(client.id)
+            writer.close()
+    
+    def step(self):
+        """模拟一步：各玩家按加入顺序执行输入，然后推进世界，最后把结果发出去"""
+        world = self.world
+        clients = list(self.clients.values())
+        for client in clients:
+            apply_input(world, client.player, restrict_input(client.player, client.next_input()), client.id)
+            client.camera.update(client.player)
+        # 没人在线时不动区块：没有视野会把已加载的区块全部卸载
+        if clients:
+            world.update_chunks(*(client.camera for client in clients))
+        world.update_items(*(client.player for client in clients))
+        step_world(world)
+        if self.autosave_interval is not None:
+            world.autosave(self.spawn, self.autosave_interval)
+        self.broadcast(clients)
+    
+    def broadcast(self, clients):
+        world = self.world
+        # 这一步变了的格子：一次查出最新的方块ID，每个客户端只拿自己手上区块里的那部分
+        cells = np.array(list(self.changed), dtype=np.int64).reshape(-1, 2)
+        self.changed.clear()
+        tiles = np.zeros(len(cells), dtype=NET_TILE_DTYPE)
+        tiles["x"], tiles["y"] = cells[:, 0], cells[:, 1]
+        tiles["id"] = world.block_ids_at(cells[:, 0], cells[:, 1])
+        tile_cxs = cells[:, 0] // CHUNK_SIZE
         
-        # 更新掉落物和拾取检测
-        world.update_items(player)
+        players = np.zeros(len(clients), dtype=NET_PLAYER_DTYPE)
+        players["id"] = [client.id for client in clients]
+        players["x"] = [client.player.x for client in clients]
+        players["y"] = [client.player.y for client in clients]
+        player_cxs = (players["x"] // (TILE_SIZE * CHUNK_SIZE)).astype(np.int64)
+        encoded = {}  # 这一步编好的区块，几个客户端要同一个区块时只编一次
         
-        # 在绘制玩家之前绘制掉落物
-        for item in world.dropped_items:
-            item.draw(screen, camera, block_images)
+        for client in clients:
+            out = bytearray()
+            # 只发它手上区块里的玩家（总包括它自己）
+            nearby = players[np.isin(player_cxs, list(client.chunks)) | (players["id"] == client.id)]
+            write_message(out, MSG_STATE, NET_STATE.pack(world.tick, client.ack, len(nearby)), nearby.tobytes())
+            inventory = tuple(client.player.inventory.values())
+            if inventory != client.inventory:
+                client.inventory = inventory
+                write_message(out, MSG_INVENTORY, np.array(inventory, dtype="<u4").tobytes())
+            if len(tiles) and client.chunks:
+                visible = tiles[np.isin(tile_cxs, list(client.chunks))]
+                if len(visible):
+                    write_message(out, MSG_TILES, visible.tobytes())
+            
+            # 和 World.update_chunks 用同样的范围：视野外一格就发过去，离开好几格才让客户端卸载
+            left, right = view_chunk_range(client.camera)
+            for cx in [cx for cx in client.chunks if cx < left - CHUNK_EVICT_MARGIN or cx > right + CHUNK_EVICT_MARGIN]:
+                client.chunks.discard(cx)
+                write_message(out, MSG_UNLOAD, NET_CHUNK.pack(cx))
+            for cx in range(left - CHUNK_LOAD_MARGIN, right + CHUNK_LOAD_MARGIN + 1):
+                if cx not in client.chunks:
+                    payload = encoded.get(cx)
+                    if payload is None:
+                        payload = encoded[cx] = self.encode_chunk(cx)
+                    client.chunks.add(cx)
+                    write_message(out, MSG_CHUNK, NET_CHUNK.pack(cx), payload)
+            
+            client.writer.write(out)
+            self.bytes_sent += len(out)
+            if client.writer.transport.get_write_buffer_size() > NET_MAX_BUFFER:
+                client.writer.close()  # 跟不上的客户端断开，handle_client 读到断开后清理
+    
+    def encode_chunk(self, cx):
+        """区块相对种子地形的差异，客户端用同一个种子生成地形再打上补丁"""
+        chunk = self.world.get_chunk(cx)
+        # 没改过的区块就是种子地形，差异为空，不用再生成一遍来比
+        base = self.world.generator.generate_chunk(cx) if chunk.modified else chunk.blocks
+        return encode_chunk_delta(chunk.blocks, base)
+
+class RemoteWorld(World):
+    """客户端上的世界副本：区块和方块变化都以服务器为准，自己不模拟方块更新，也不存盘"""
+    def schedule_block_update(self, x, y, delay=1):
+        pass  # 沙子下落、流体流动都由服务器模拟
+    
+    def evict_chunk(self, cx):
+        self.chunks.pop(cx, None)
+        self.dirty_chunks.discard(cx)
+    
+    def install_chunk(self, cx, blocks):
+        """换上服务器发来的区块"""
+        chunk = Chunk(cx, self.height)
+        chunk.blocks[:] = blocks
+        self.chunks[cx] = chunk
+        self.light_chunks(cx, cx + 1)
+        for listener in self.area_listeners:
+            listener(cx * CHUNK_SIZE, 0, (cx + 1) * CHUNK_SIZE, self.height)
+    
+    def apply_tiles(self, tiles):
+        for x, y, block_id in tiles.tolist():
+            if x // CHUNK_SIZE in self.chunks:
+                self.set_block(x, y, BLOCK_NAMES[block_id])
+
+class NetworkClient:
+    """连到服务器的客户端：把每步的输入发过去，按收到的消息更新本地副本。
+    
+    mirror 为 False 时（模拟客户端）只解析消息、不保存区块，一个进程里就能模拟很多玩家。
+    """
+    def __init__(self, mirror=True):
+        self.mirror = mirror
+        self.world = None
+        self.player = None
+        self.player_id = None
+        self.others = {}  # 其他玩家编号 -> Player（只在 mirror 时维护）
+        self.connected = False
+        self.seq = 0
+        self.sent = {}  # 还没确认的输入序号 -> 发送时间
+        self.rtts = []  # 输入从发出到被服务器处理后确认的往返时间（秒）
+        self.state_time = time.perf_counter()  # 最近一次收到玩家位置的时间，渲染时据此插值
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.tiles_received = 0
+    
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        out = bytearray()
+        write_message(out, MSG_HELLO, NET_HELLO.pack(NET_MAGIC, NET_VERSION))
+        self.writer.write(out)
+        kind, payload = await read_message(self.reader)
+        if kind != MSG_WELCOME:
+            raise ConnectionError("server refused the connection")
+        self.player_id, seed, height, x, y = NET_WELCOME.unpack(payload)
+        self.player = Player(x, y)
+        if self.mirror:
+            self.world = RemoteWorld(height, seed)
+        self.connected = True
+    
+    def send_input(self, tick_input):
+        self.seq += 1
+        self.sent[self.seq] = time.perf_counter()
+        out = bytearray()
+        write_message(out, MSG_INPUT, encode_input(self.seq, tick_input))
+        self.writer.write(out)
+    
+    async def receive(self):
+        """一直读消息直到连接断开"""
+        try:
+            while True:
+                kind, payload = await read_message(self.reader)
+                self.bytes_received += NET_HEADER.size + len(payload)
+                self.handle(kind, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connected = False
+    
+    def handle(self, kind, payload):
+        if kind == MSG_STATE:
+            now = time.perf_counter()
+            _, ack, count = NET_STATE.unpack_from(payload, 0)
+            sent = self.sent.pop(ack, None)
+            if sent is not None:
+                self.rtts.append(now - sent)
+            for seq in [seq for seq in self.sent if seq < ack]:
+                del self.sent[seq]  # 被服务器丢掉的旧输入
+            players = np.frombuffer(payload, dtype=NET_PLAYER_DTYPE, count=count, offset=NET_STATE.size)
+            if not self.mirror:
+                players = players[players["id"] == self.player_id]
+            others = {}
+            for player_id, x, y in players.tolist():
+                if player_id == self.player_id:
+                    player = self.player
+                else:
+                    player = others[player_id] = self.others.get(player_id) or Player(x, y)
+                player.prev_x, player.prev_y = player.x, player.y
+                player.x, player.y = x, y
+            self.others = others
+            self.state_time = now
+        elif kind == MSG_INVENTORY:
+            counts = np.frombuffer(payload, dtype="<u4").tolist()
+            self.player.inventory.update(zip(BLOCK_TYPES, counts))
+        elif kind == MSG_CHUNK:
+            self.chunks_received += 1
+            if self.world is not None:
+                cx, = NET_CHUNK.unpack_from(payload, 0)
+                blocks, _ = decode_chunk_delta(memoryview(payload)[NET_CHUNK.size:],
+                                               self.world.generator.generate_chunk(cx))
+                self.world.install_chunk(cx, blocks)
+        elif kind == MSG_UNLOAD:
+            if self.world is not None:
+                self.world.evict_chunk(*NET_CHUNK.unpack(payload))
+        elif kind == MSG_TILES:
+            tiles = np.frombuffer(payload, dtype=NET_TILE_DTYPE)
+            self.tiles_received += len(tiles)
+            if self.world is not None:
+                self.world.apply_tiles(tiles)
+    
+    def close(self):
+        self.writer.close()
+        if self.world is not None:
+            self.world.close()
+
+def bot_input(tick, player, bot_id):
+    """模拟客户端的输入：不看地形，来回走、时不时跳，一直挖面前的方块，隔一会儿在身后放一个"""
+    phase = tick + bot_id * 97  # 错开各个模拟客户端的节奏
+    dx = 1 if (phase // WANDER_PERIOD) % 2 == 0 else -1
+    front_x = int((player.x + player.width / 2) // TILE_SIZE) + dx
+    head_y = int(player.y // TILE_SIZE)
+    feet_y = int((player.y + player.height - 1) // TILE_SIZE)
+    mine_y = head_y if (phase // TICK_RATE) % 2 == 0 else feet_y
+    place = [(front_x - 2 * dx, head_y - 1)] if phase % BOT_PLACE_INTERVAL == 0 else []
+    return TickInput(dx, jump=phase % WANDER_JUMP_INTERVAL == 0, mine=(front_x, mine_y), place=place)
+
+async def run_bots(host, port, count, ticks=BOT_TICKS):
+    """在本进程里开 count 个无头模拟客户端，按固定步长各发 ticks 步输入，返回统计"""
+    clients = [NetworkClient(mirror=False) for _ in range(count)]
+    for client in clients:
+        await client.connect(host, port)
+    receivers = [asyncio.create_task(client.receive()) for client in clients]
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for bot_id, client in enumerate(clients):
+            if client.connected:
+                client.send_input(bot_input(tick, client.player, bot_id))
+        next_tick += TICK_TIME
+        await asyncio.sleep(max(next_tick - loop.time(), 0.0))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+    await asyncio.gather(*receivers)
+    
+    rtts = sorted(rtt for client in clients for rtt in client.rtts)
+    return {
+        "clients": count,
+        "connected": sum(bool(client.rtts) for client in clients),
+        "ticks_per_sec": ticks / elapsed,
+        "kbytes_per_client_sec": sum(client.bytes_received for client in clients) / count / elapsed / 1024,
+        "chunks": sum(client.chunks_received for client in clients),
+        "tiles": sum(client.tiles_received for client in clients),
+        "rtt_p50_ms": rtts[len(rtts) // 2] * 1000 if rtts else float("nan"),
+        "rtt_p99_ms": rtts[int(len(rtts) * 0.99)] * 1000 if rtts else float("nan"),
+    }
+
+async def run_local_bots(count, ticks=BOT_TICKS, seed=None):
+    """本进程里起一个服务器，再连上 count 个模拟客户端，返回客户端和服务器两边的统计"""
+    world, spawn = create_world(seed=seed)
+    server = GameServer(world, spawn)
+    serving = asyncio.create_task(server.serve("127.0.0.1", 0))
+    await server.started.wait()
+    try:
+        stats = await run_bots("127.0.0.1", server.port, count, ticks)
+    finally:
+        server.stop()
+        await serving
+        world.close()
+    tick_times = sorted(server.tick_times)
+    stats["server_tick_mean_ms"] = sum(tick_times) / len(tick_times) * 1000
+    stats["server_tick_p99_ms"] = tick_times[int(len(tick_times) * 0.99)] * 1000
+    stats["server_kbytes_sent"] = server.bytes_sent / 1024
+    return stats
+
+def run_server(host="127.0.0.1", port=NET_PORT, world_dir=None, save_mode="full", seed=None,
+               autosave_interval=AUTOSAVE_INTERVAL):
+    """作为多人服务器运行（不开窗口），Ctrl+C 停止；指定存档目录时自动存档并在退出时保存"""
+    world, spawn = create_world(world_dir, save_mode, seed)
+    server = GameServer(world, spawn, autosave_interval if world_dir is not None else None)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if world_dir is not None:
+            world.save(spawn)
+        world.close()
+
+async def run_client(host, port=NET_PORT, renderer="chunks"):
+    """多人模式的客户端窗口：画服务器推过来的世界，本地只采集输入"""
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption(f"Minecraft 2D - 1.01 ({host}:{port})")
+    block_images = load_images()
+    hotbar = Hotbar(SpriteCache(block_images))
+    
+    client = NetworkClient()
+    await client.connect(host, port)
+    world, player = client.world, client.player
+    camera = Camera(world.height * TILE_SIZE)
+    camera.update(player)
+    world_renderer = RENDERERS[renderer](world, block_images)
+    receiver = asyncio.create_task(client.receive())
+    
+    local_input = LocalInput()
+    accumulator = 0.0
+    previous = time.perf_counter()
+    try:
+        while local_input.running and client.connected:
+            frame_start = time.perf_counter()
+            tick_input = local_input.poll(camera)
+            # 和单人模式一样按固定步长发输入，服务器每步消费一个
+            accumulator += min(frame_start - previous, MAX_FRAME_TIME)
+            previous = frame_start
+            while accumulator >= TICK_TIME:
+                client.send_input(tick_input)
+                local_input.consume(tick_input)
+                accumulator -= TICK_TIME
+            world.update_lighting()
+            
+            # 服务器每步发一次位置，在最近两次之间插值
+            alpha = min((time.perf_counter() - client.state_time) / TICK_TIME, 1.0)
+            camera.update(player, alpha)
+            world_renderer.draw(screen, camera)
+            for other in client.others.values():
+                draw_player(screen, camera, other, alpha, OTHER_PLAYER_COLOR)
+            draw_player(screen, camera, player, alpha)
+            hotbar.draw(screen, player)
+            draw_cursor(screen, camera, world, block_images)
+            pygame.display.flip()
+            # 等到下一帧：这段时间里事件循环接收服务器的消息
+            await asyncio.sleep(max(1.0 / FPS - (time.perf_counter() - frame_start), 0.0))
+    finally:
+        client.close()
+        await receiver
+        pygame.quit()
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return (host, int(port)) if host else (address, NET_PORT)
+
+# 输入录像：记下世界种子和每个模拟步的输入，回放时在同一个种子的新世界里逐步重放，模拟过程和录的时候完全一样，
+# 真实的游戏过程就成了可以反复跑的基准。文件是 REPLAY_HEADER 加 zlib 压缩的输入记录，
+# 每条记录沿用 NET_INPUT 的格式，序号字段存这条输入连续重复的步数（按住方向键走路时大部分步的输入都一样）
+REPLAY_MAGIC = b"MC2I"
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct("<4sHQII")  # 魔数, 版本, 世界种子, 步数, 结束时的状态校验和
+
+def state_checksum(world, player):
+    """玩家、物品栏、掉落物的位置速度和已加载区块的方块算一个校验和，回放结束时和录像里的比对"""
+    crc = zlib.crc32(struct.pack("<IdddI", world.tick, player.x, player.y, player.velocity_y,
+                                 len(world.dropped_items)))
+    crc = zlib.crc32(np.array([player.inventory[block_type] for block_type in BLOCK_TYPES], dtype="<i8"), crc)
+    items = world.dropped_items
+    for name in ("x", "y", "velocity_x", "velocity_y", "count"):
+        crc = zlib.crc32(np.ascontiguousarray(getattr(items, name)[:items.size]), crc)
+    for cx in sorted(world.chunks):
+        crc = zlib.crc32(struct.pack("<i", cx), crc)
+        crc = zlib.crc32(np.ascontiguousarray(world.chunks[cx].blocks), crc)
+    return crc
+
+class InputRecorder:
+    """把每个模拟步的输入按连续相同的段攒起来，save 时写进录像文件；只能录新世界，回放靠种子重建初始状态"""
+    def __init__(self, world):
+        self.seed = world.seed
+        self.runs = []  # [重复步数, TickInput 副本, 比较用的键]
+    
+    def record(self, tick_input):
+        key = (tick_input.dx, bool(tick_input.jump), tick_input.mine, tuple(tick_input.place))
+        if self.runs and self.runs[-1][2] == key and self.runs[-1][0] < 0xFFFFFFFF:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, TickInput(tick_input.dx, tick_input.jump, tick_input.mine, tick_input.place), key])
+    
+    def save(self, path, world, player):
+        body = b"".join(encode_input(count, tick_input) for count, tick_input, _ in self.runs)
+        ticks = sum(run[0] for run in self.runs)
+        with open(path, "wb") as f:
+            f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, ticks, state_checksum(world, player)))
+            f.write(zlib.compress(body, 9))
+
+def load_replay(path):
+    """读录像文件，返回 (种子, 步数, 校验和, [(重复步数, TickInput), ...])"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, seed, ticks, checksum = REPLAY_HEADER.unpack_from(data, 0)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"unsupported replay: {path}")
+    body = memoryview(zlib.decompress(data[REPLAY_HEADER.size:]))
+    runs = []
+    offset = 0
+    while offset < len(body):
+        count, tick_input = decode_input(body[offset:])
+        offset += NET_INPUT.size + 8 * len(tick_input.place)
+        runs.append((count, tick_input))
+    return seed, ticks, checksum, runs
+
+def run_replay(path, renderer=None, profile_csv=None):
+    """不等帧率、尽快重放录像，返回统计；renderer 为 None 时不开窗口，否则每个模拟步画一帧"""
+    seed, ticks, checksum, runs = load_replay(path)
+    if renderer is None:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.display.quit()
+        pygame.display.init()
+    else:
+        screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption(f"Minecraft 2D - 1.01 (replay {os.path.basename(path)})")
+        block_images = load_images()
+        sprites = SpriteCache(block_images)
+        hotbar = Hotbar(sprites)
+    
+    world, player = create_world(seed=seed)
+    camera = Camera(WORLD_HEIGHT * TILE_SIZE)
+    camera.update(player)
+    if renderer is not None:
+        world_renderer = RENDERERS[renderer](world, block_images)
+    profiler = FrameProfiler(profile_csv)  # 每个模拟步记一帧
+    
+    tick_times = []
+    running = True
+    start = time.perf_counter()
+    for tick_input in (tick_input for count, tick_input in runs for _ in range(count)):
+        profiler.begin_frame()
+        tick_start = time.perf_counter()
+        simulate_tick(world, player, camera, tick_input, profiler)
+        tick_times.append(time.perf_counter() - tick_start)
+        blits = 0
+        if renderer is not None:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+            profiler.mark("events")
+            draw_scene(screen, camera, world, player, 1.0, world_renderer, hotbar, sprites, block_images, profiler)
+            profiler.mark("sprites")
+            profiler.draw(screen)
+            profiler.mark("overlay")
+            pygame.display.flip()
+            profiler.mark("flip")
+            blits = world_renderer.blits + world.dropped_items.blits
+        if profiler.enabled:
+            profiler.end_frame(ticks=1, entities=len(world.dropped_items), chunks=len(world.chunks), blits=blits)
+        if not running:
+            break
+    elapsed = time.perf_counter() - start
+    
+    stats = {"ticks": len(tick_times), "seconds": elapsed,
+             "ticks_per_s": len(tick_times) / elapsed if elapsed > 0 else float("inf")}
+    tick_times.sort()
+    if tick_times:
+        stats["tick_mean_ms"] = sum(tick_times) / len(tick_times) * 1000
+        stats["tick_p99_ms"] = tick_times[int(len(tick_times) * 0.99)] * 1000
+        stats["tick_max_ms"] = tick_times[-1] * 1000
+    # 只有完整重放才能比对结束状态；不一致说明模拟里混进了不确定的东西
+    if len(tick_times) == ticks:
+        stats["deterministic"] = state_checksum(world, player) == checksum
+    world.close()
+    profiler.close()
+    pygame.quit()
+    return stats
+
+def main(renderer="chunks", world_dir=None, autosave_interval=AUTOSAVE_INTERVAL, save_mode="full", seed=None,
+         profile_csv=None, record=None):
+    # 创建游戏窗口
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption("Minecraft 2D - 1.01")
+    
+    clock = pygame.time.Clock()
+    block_images = load_images()
+    sprites = SpriteCache(block_images)
+    hotbar = Hotbar(sprites)
+    world, player = create_world(world_dir, save_mode, seed)
+    camera = Camera(WORLD_HEIGHT * TILE_SIZE)
+    camera.update(player)
+    world_renderer = RENDERERS[renderer](world, block_images)
+    profiler = FrameProfiler(profile_csv)
+    recorder = InputRecorder(world) if record is not None else None
+    
+    local_input = LocalInput()
+    accumulator = 0.0  # 还没模拟的时间
+    previous = time.perf_counter()
+    
+    while local_input.running:
+        profiler.begin_frame()
+        tick_input = local_input.poll(camera, profiler)
+        profiler.mark("events")
         
-        # 在绘制完方块后绘制损坏效果
-        world.draw_block_damage(screen, camera, block_images)
+        # 固定步长模拟：按真实经过的时间推进若干步，帧率高低不影响游戏速度
+        now = time.perf_counter()
+        accumulator += min(now - previous, MAX_FRAME_TIME)
+        previous = now
+        ticks = 0
+        while accumulator >= TICK_TIME:
+            if recorder is not None:
+                recorder.record(tick_input)
+            simulate_tick(world, player, camera, tick_input, profiler)
+            local_input.consume(tick_input)
+            accumulator -= TICK_TIME
+            ticks += 1
+        if world_dir is not None:
+            world.autosave(player, autosave_interval)
+        profiler.mark("autosave")
         
-        # 获取当前鼠标指向的方块位置
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        world_x = int((mouse_x + camera.scroll_x) // TILE_SIZE)
-        world_y = int((mouse_y + camera.scroll_y) // TILE_SIZE)
+        # 渲染时在上一步和这一步之间插值，画面不会因为步长和帧率不同步而抖动
+        alpha = accumulator / TICK_TIME
+        camera.update(player, alpha)
         
-        # 在所有方块和物品渲染之后，绘制光标
-        cursor_screen_x = world_x * TILE_SIZE - camera.scroll_x
-        cursor_screen_y = world_y * TILE_SIZE - camera.scroll_y
+        draw_scene(screen, camera, world, player, alpha, world_renderer, hotbar, sprites, block_images, profiler)
+        draw_cursor(screen, camera, world, block_images)
+        profiler.mark("sprites")
         
-        # 只在没有挖掘进行时显示普通光标
-        block_key = f"{world_x},{world_y}"
-        if block_key not in world.block_damage and "cursor" in block_images:
-            screen.blit(block_images["cursor"], (cursor_screen_x, cursor_screen_y))
+        profiler.draw(screen)
+        profiler.mark("overlay")
         
         pygame.display.flip()
-        clock.tick(60)
+        profiler.mark("flip")
+        clock.tick(FPS)
+        profiler.mark("idle")
+        if profiler.enabled:
+            profiler.end_frame(ticks=ticks, entities=len(world.dropped_items), chunks=len(world.chunks),
+                               blits=world_renderer.blits + world.dropped_items.blits)
 
+    if recorder is not None:
+        recorder.save(record, world, player)
+    if world_dir is not None:
+        world.save(player)
+    world.close()
+    profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Minecraft 2D")
+    parser.add_argument("--renderer", choices=sorted(RENDERERS), default="chunks",
+                        help="世界渲染方式：chunks 为区块离屏缓存，scroll 为平移复用上一帧")
+    parser.add_argument("--world", metavar="DIR",
+                        help="存档目录：存在则读取，退出时保存到这里")
+    parser.add_argument("--autosave-interval", type=float, default=AUTOSAVE_INTERVAL, metavar="SECONDS",
+                        help="自动存档间隔（秒）")
+    parser.add_argument("--save-mode", choices=SAVE_MODES, default="full",
+                        help="新存档的格式：full 保存整个区块，delta 只保存种子 + 玩家改动过的格子")
+    parser.add_argument("--headless", action="store_true",
+                        help="不开窗口，用自动输入尽快运行模拟")
+    parser.add_argument("--ticks", type=int,
+                        help=f"无头模式运行的模拟步数（默认 {HEADLESS_TICKS}），模拟客户端发送输入的步数（默认 {BOT_TICKS}）")
+    parser.add_argument("--seed", type=int, help="新世界的种子")
+    parser.add_argument("--profile-csv", metavar="FILE",
+                        help="把每帧各阶段的耗时写进 CSV 文件")
+    parser.add_argument("--server", action="store_true",
+                        help="作为多人服务器运行（不开窗口），Ctrl+C 停止")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="服务器监听的地址")
+    parser.add_argument("--port", type=int, default=NET_PORT,
+                        help="服务器监听的端口")
+    parser.add_argument("--connect", metavar="HOST[:PORT]",
+                        help="连接到多人服务器")
+    parser.add_argument("--bots", type=int, metavar="N",
+                        help="开 N 个无头模拟客户端连到 --connect 的服务器；没有 --connect 时在本进程里起一个服务器")
+    parser.add_argument("--record", metavar="FILE",
+                        help="把世界种子和每个模拟步的输入录进文件（单人模式和无头模式，只能录新世界）")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="尽快重放录像并输出每步耗时；加 --headless 不开窗口，否则用 --renderer 画出每一步")
+    args = parser.parse_args()
+    if args.record and args.world and os.path.exists(os.path.join(args.world, "level.dat")):
+        parser.error("--record needs a new world: replays rebuild the start from the seed")
+    if args.server:
+        run_server(args.host, args.port, world_dir=args.world, save_mode=args.save_mode, seed=args.seed,
+                   autosave_interval=args.autosave_interval)
+    elif args.bots:
+        ticks = args.ticks or BOT_TICKS
+        if args.connect:
+            stats = asyncio.run(run_bots(*parse_address(args.connect), args.bots, ticks))
+        else:
+            stats = asyncio.run(run_local_bots(args.bots, ticks, seed=args.seed))
+        for key, value in stats.items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    elif args.replay:
+        stats = run_replay(args.replay, renderer=None if args.headless else args.renderer,
+                           profile_csv=args.profile_csv)
+        for key, value in stats.items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    elif args.connect:
+        asyncio.run(run_client(*parse_address(args.connect), renderer=args.renderer))
+    elif args.headless:
+        ticks = args.ticks or HEADLESS_TICKS
+        rate = run_headless(ticks, world_dir=args.world, save_mode=args.save_mode, seed=args.seed,
+                            autosave_interval=args.autosave_interval, record=args.record)
+        print(f"{ticks} ticks, {rate:.0f} ticks/s")
+    else:
+        main(renderer=args.renderer, world_dir=args.world, autosave_interval=args.autosave_interval,
+             save_mode=args.save_mode, seed=args.seed, profile_csv=args.profile_csv, record=args.record)
\ No newline at end of file
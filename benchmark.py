@@ -0,0 +1,365 @@
+"""无头性能测试：地形生成、玩家碰撞、掉落物更新、整帧渲染和区块预生成。
+
+用法：
+    python benchmark.py                              # 测 Minecraft_2D
+    python benchmark.py Minecraft_2D_1.01 Minecraft_2D --output bench.json
+    python benchmark.py Minecraft_2D --baseline bench.json   # 与之前的结果对比
+
+每个版本在单独的子进程里用 SDL dummy 驱动运行，结果以 JSON 输出。
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SEED = 12345
+TERRAIN_WIDTHS = [100, 1000, 10000]  # 地形生成测试的列数
+PLAYER_TICKS = 2000
+PLAYER_TURN_TICKS = 100  # 玩家每走这么多步掉头
+PLAYER_JUMP_TICKS = 30
+ITEM_COUNTS = [10, 1000, 10000]
+ITEM_TICKS = 50
+RENDER_FRAMES = 200
+PREGENERATE_COUNTS = [128, 512, 2048, 8192]  # 预生成测试的区块数：出生点的 128 到远大于进程池回本点
+WORLD_WIDTH = 100  # 玩家、掉落物和渲染测试用的世界宽度（列）
+WORLD_HEIGHT = 100
+
+
+def percentile(sorted_values, q):
+    """已排序样本的 q 分位数（线性插值）"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(name, samples, ops_per_sample=1):
+    """把每次操作的耗时（秒）汇总成一条结果"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "name": name,
+        "samples": len(ordered),
+        "ops_per_sec": len(ordered) * ops_per_sample / total if total > 0 else float("inf"),
+        "mean_ms": total / len(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.5) * 1000,
+        "p90_ms": percentile(ordered, 0.9) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def timed(fn, repeat, warmup=1):
+    """先空跑 warmup 次（首次调用的延迟初始化不算进结果），再逐次计时"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+class Game:
+    """把不同版本的 main.py 包装成同一套接口。
+
+    早期版本（如 1.01）是固定宽度的名称列表世界、逐个对象的掉落物，渲染写在 main() 里；
+    当前版本是按区块生成的无限世界。
+    """
+    def __init__(self, game_dir):
+        self.dir = os.path.abspath(game_dir)
+        # 早期版本在导入时用相对路径加载贴图，只能先切到游戏目录
+        os.chdir(self.dir)
+        spec = importlib.util.spec_from_file_location("game_main", os.path.join(self.dir, "main.py"))
+        self.m = importlib.util.module_from_spec(spec)
+        # 登记到 sys.modules：进程池要按模块名 pickle 地形生成器
+        sys.modules[spec.name] = self.m
+        spec.loader.exec_module(self.m)
+        self.legacy = not hasattr(self.m, "TerrainGenerator")
+        self.pygame = self.m.pygame
+        if self.pygame.display.get_surface() is None:
+            self.pygame.display.set_mode((self.m.WINDOW_WIDTH, self.m.WINDOW_HEIGHT))
+
+    def generate(self, width):
+        if self.legacy:
+            self.m.World(width, WORLD_HEIGHT).generate_terrain()
+        else:
+            self.m.TerrainGenerator(SEED, WORLD_HEIGHT).generate_terrain(0, width)
+
+    def make_world(self):
+        if self.legacy:
+            world = self.m.World(WORLD_WIDTH, WORLD_HEIGHT)
+            world.generate_terrain()
+        else:
+            world = self.m.World(WORLD_HEIGHT, seed=SEED)
+            world.ensure_chunks(-1, WORLD_WIDTH // self.m.CHUNK_SIZE + 1)
+        return world
+
+    def make_camera(self):
+        tile = self.m.TILE_SIZE
+        if self.legacy:
+            return self.m.Camera(WORLD_WIDTH * tile, WORLD_HEIGHT * tile)
+        return self.m.Camera(WORLD_HEIGHT * tile)
+
+    def spawn_item(self, world, x, y, item_type):
+        if self.legacy:
+            world.dropped_items.append(self.m.DroppedItem(x, y, item_type))
+        else:
+            world.dropped_items.spawn(x, y, item_type)
+
+    def make_frame(self, world, player, camera, screen):
+        """返回一个把整帧画到 screen 上的函数"""
+        m = self.m
+        images = m.load_images()
+        if self.legacy:
+            return lambda: legacy_frame(m, world, player, camera, screen, images)
+
+        renderer = m.RENDERERS["chunks"](world, images)
+        sprites = m.SpriteCache(images)
+        hotbar = m.Hotbar(sprites)
+
+        def frame():
+            camera.update(player)
+            renderer.draw(screen, camera)
+            self.pygame.draw.rect(screen, (255, 0, 0), (player.x - camera.scroll_x, player.y - camera.scroll_y,
+                                                        player.width, player.height))
+            hotbar.draw(screen, player)
+            world.dropped_items.draw(screen, camera, sprites)
+            world.draw_block_damage(screen, camera, images)
+        return frame
+
+
+def legacy_frame(m, world, player, camera, screen, block_images):
+    """1.01 的 main() 里每帧的绘制代码，原样搬出来"""
+    pygame = m.pygame
+    tile = m.TILE_SIZE
+    camera.update(player)
+    screen.fill(m.SKY_COLOR)
+    for x in range(world.width):
+        screen_x = x * tile - camera.scroll_x
+        if -tile <= screen_x <= m.WINDOW_WIDTH:
+            for y in range(world.height):
+                screen_y = y * tile - camera.scroll_y
+                if -tile <= screen_y <= m.WINDOW_HEIGHT:
+                    block = world.blocks[x][y]
+                    if block and block in block_images:
+                        screen.blit(block_images[block], (screen_x, screen_y))
+    pygame.draw.rect(screen, (255, 0, 0), (player.x - camera.scroll_x, player.y - camera.scroll_y,
+                                           player.width, player.height))
+
+    hotbar_x = (m.WINDOW_WIDTH - m.HOTBAR_IMAGE.get_width()) // 2
+    hotbar_y = m.WINDOW_HEIGHT - m.HOTBAR_IMAGE.get_height() - m.HOTBAR_Y_OFFSET
+    screen.blit(m.HOTBAR_IMAGE, (hotbar_x, hotbar_y))
+    visible_slots = 0
+    for i, block_type in enumerate(m.BLOCK_TYPES):
+        if block_type in block_images and player.inventory[block_type] > 0:
+            if visible_slots == 0:
+                slot_x = hotbar_x + m.HOTBAR_PADDING
+            elif visible_slots == 1:
+                slot_x = hotbar_x + m.HOTBAR_PADDING + (int(m.SLOT_SIZE * 6.0))
+            else:
+                slot_x = hotbar_x + m.HOTBAR_PADDING + (int(m.SLOT_SIZE * 4.0) * visible_slots)
+            slot_y = hotbar_y + m.HOTBAR_PADDING
+            item_size = int(m.SLOT_SIZE * m.ITEM_SCALE)
+            scaled_block = pygame.transform.scale(block_images[block_type], (item_size, item_size))
+            screen.blit(scaled_block, (slot_x + m.ITEM_PADDING, slot_y + m.ITEM_VERTICAL_OFFSET))
+            count_text = str(player.inventory[block_type])
+            font = pygame.font.Font(None, int(m.SLOT_SIZE * 2))
+            text_surface = font.render(count_text, True, (255, 255, 255))
+            text_rect = text_surface.get_rect()
+            text_rect.bottomright = (slot_x + m.SLOT_SIZE + 4, slot_y + m.SLOT_SIZE + 4)
+            shadow_surface = font.render(count_text, True, (0, 0, 0))
+            screen.blit(shadow_surface, (text_rect.x + 2, text_rect.y + 2))
+            screen.blit(text_surface, text_rect)
+            if i == player.selected_block:
+                pygame.draw.rect(screen, (255, 255, 255), (slot_x, slot_y, m.SLOT_SIZE - 1, m.SLOT_SIZE - 1), 1)
+            visible_slots += 1
+
+    for item in world.dropped_items:
+        item.draw(screen, camera, block_images)
+
+
+def bench_terrain(game, quick):
+    results = []
+    for width in TERRAIN_WIDTHS:
+        repeat = max(3, 30000 // width // (10 if quick else 1))
+        results.append(summarize(f"generate_terrain[{width}]", timed(lambda: game.generate(width), repeat)))
+    return results
+
+
+def bench_player(game, quick):
+    world = game.make_world()
+    player = game.m.Player(WORLD_WIDTH * game.m.TILE_SIZE // 2, 0)
+    samples = []
+    for tick in range(PLAYER_TICKS // (10 if quick else 1)):
+        dx = 1 if (tick // PLAYER_TURN_TICKS) % 2 == 0 else -1
+        if tick % PLAYER_JUMP_TICKS == 0 and not player.jumping:
+            player.velocity_y = player.jump_force
+            player.jumping = True
+        start = time.perf_counter()
+        player.move(dx, world)
+        player.update(world)
+        samples.append(time.perf_counter() - start)
+    return [summarize("player_tick", samples)]
+
+
+def bench_items(game, quick):
+    results = []
+    tile = game.m.TILE_SIZE
+    for count in ITEM_COUNTS:
+        random.seed(SEED)
+        world = game.make_world()
+        # 玩家放在远处，掉落物不会被捡走
+        player = game.m.Player(-1000 * tile, 0)
+        for _ in range(count):
+            x = random.uniform(0, WORLD_WIDTH * tile)
+            y = random.uniform(0, WORLD_HEIGHT * tile / 3)
+            game.spawn_item(world, x, y, "dirt")
+        ticks = max(3, ITEM_TICKS // (10 if quick else 1))
+        results.append(summarize(f"update_items[{count}]", timed(lambda: world.update_items(player), ticks)))
+    return results
+
+
+def bench_pregenerate(game, quick):
+    """同样的区块数分别用单进程和进程池预生成，看进程池从哪里开始回本"""
+    if game.legacy:
+        return []
+    m = game.m
+    workers = max(2, os.cpu_count() or 1)
+    threshold = m.PREGENERATE_CHUNKS_PER_WORKER
+    results = []
+    for count in PREGENERATE_COUNTS:
+        if quick and count > 2048:
+            continue
+        for label, pool_workers in (("serial", 1), (f"pool{workers}", workers)):
+            # 临时去掉门槛，强制按指定的进程数生成
+            m.PREGENERATE_CHUNKS_PER_WORKER = 1
+            samples = []
+            try:
+                for _ in range(1 if quick else 3):
+                    world = m.World(WORLD_HEIGHT, seed=SEED)
+                    start = time.perf_counter()
+                    world.pregenerate(0, count, pool_workers)
+                    samples.append(time.perf_counter() - start)
+                    world.close()
+            finally:
+                m.PREGENERATE_CHUNKS_PER_WORKER = threshold
+            results.append(summarize(f"pregenerate_{label}[{count}]", samples, count))
+    return results
+
+
+def bench_render(game, quick):
+    random.seed(SEED)
+    world = game.make_world()
+    tile = game.m.TILE_SIZE
+    player = game.m.Player(WORLD_WIDTH * tile // 2, WORLD_HEIGHT * tile // 3)
+    for block_type in ("dirt", "grass", "sand"):
+        player.inventory[block_type] = 5
+    for _ in range(20):
+        game.spawn_item(world, random.uniform(35, 65) * tile, WORLD_HEIGHT * tile / 3, "dirt")
+    camera = game.make_camera()
+    screen = game.pygame.Surface((game.m.WINDOW_WIDTH, game.m.WINDOW_HEIGHT)).convert()
+    frame = game.make_frame(world, player, camera, screen)
+    frame()  # 预热：离屏缓存、贴图缓存
+
+    samples = []
+    for i in range(RENDER_FRAMES // (10 if quick else 1)):
+        # 每帧横向移动一点，让渲染也要处理滚动
+        player.x = WORLD_WIDTH * tile // 2 + (i % 64) * 2
+        start = time.perf_counter()
+        frame()
+        samples.append(time.perf_counter() - start)
+    return [summarize("render_frame", samples)]
+
+
+BENCHMARKS = {
+    "terrain": bench_terrain,
+    "player": bench_player,
+    "items": bench_items,
+    "render": bench_render,
+    "pregenerate": bench_pregenerate,
+}
+
+
+def run_game(game_dir, names, quick):
+    """在当前进程里测一个版本，返回结果字典"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    game = Game(game_dir)
+    results = []
+    for name in names:
+        results.extend(BENCHMARKS[name](game, quick))
+    return {
+        "game": os.path.basename(game.dir),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """打印与基准结果的对比，比值 > 1 表示更快"""
+    base = {(r["game"], b["name"]): b for r in baseline for b in r["results"]}
+    base_by_name = {b["name"]: b for r in baseline for b in r["results"]}
+    for run in report:
+        for result in run["results"]:
+            old = base.get((run["game"], result["name"]), base_by_name.get(result["name"]))
+            if old is None:
+                continue
+            ratio = result["ops_per_sec"] / old["ops_per_sec"]
+            flag = "  SLOWER" if ratio < 0.9 else ""
+            print(f"{run['game']:<20} {result['name']:<24} {ratio:8.2f}x{flag}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minecraft 2D 无头性能测试")
+    parser.add_argument("games", nargs="*", default=["Minecraft_2D"],
+                        help="要测试的版本目录（相对于仓库根目录或绝对路径）")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS),
+                        help="只运行指定的测试，可以多次给出")
+    parser.add_argument("--quick", action="store_true", help="减少重复次数，快速冒烟")
+    parser.add_argument("--output", metavar="FILE", help="把 JSON 结果写到文件，而不是标准输出")
+    parser.add_argument("--baseline", metavar="FILE", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    names = args.only or list(BENCHMARKS)
+
+    if args.worker:
+        json.dump(run_game(args.games[0], names, args.quick), sys.stdout)
+        return
+
+    # 每个版本单独一个子进程：各版本的 main.py 在导入时就会初始化 pygame
+    report = []
+    for game_dir in args.games:
+        if not os.path.isabs(game_dir) and not os.path.isdir(game_dir):
+            game_dir = os.path.join(ROOT, game_dir)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", os.path.abspath(game_dir)]
+        command += [f"--only={name}" for name in names]
+        if args.quick:
+            command.append("--quick")
+        env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")  # 不要让 pygame 的欢迎语混进 JSON
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True, env=env).stdout
+        report.append(json.loads(output))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Minecraft_2D"))
+
+import main  # noqa: E402
+
+
+def test_negative_seed_matches_its_unsigned_form():
+    # 存档、录像里存的是 64 位无符号种子，读回来的世界必须和原来的一样
+    worlds = [main.World(seed=-5), main.World(seed=2 ** 64 - 5)]
+    try:
+        for world in worlds:
+            for i in range(8):
+                world.dropped_items.spawn(0, 0, "dirt")
+        a, b = (world.dropped_items for world in worlds)
+        assert worlds[0].seed == worlds[1].seed == 2 ** 64 - 5
+        assert worlds[0].generator.seed == worlds[1].generator.seed
+        assert a.velocity_x[:a.size].tolist() == b.velocity_x[:b.size].tolist()
+    finally:
+        for world in worlds:
+            world.close()